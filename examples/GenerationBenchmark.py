@@ -0,0 +1,82 @@
+import sys
+import time
+
+from ravi.Ravi import *
+
+# Every lamp can be switched on and off independently, so a world with N lamps has 2^N states and N * 2^N events.
+# Usage: python -m examples.GenerationBenchmark [max_lamp_count] [processes]
+# With processes, every setting is also generated by generateNarrativeModelInParallel and the speedup is printed.
+
+IS_ON: string = "is on"
+
+
+# ======================================================= Context ======================================================
+
+
+def lampName(index: int) -> string:
+    return "lamp " + str(index)
+
+
+def buildSetting(lamp_count: int) -> NarrationSetting:
+    class_lamp = EntityClass()
+    class_lamp.addProperty(IS_ON, bool, False)
+
+    context = NarrativeContext()
+    for i in range(lamp_count):
+        context.addEntity(lampName(i), class_lamp)
+
+    choices = []
+    for i in range(lamp_count):
+        choices.append(NarrativeChoice(lambda w, lamp=lampName(i): not w.getValue(lamp, IS_ON),
+                                       switchOn(lampName(i)),
+                                       "switch on " + lampName(i)))
+        choices.append(NarrativeChoice(lambda w, lamp=lampName(i): w.getValue(lamp, IS_ON),
+                                       switchOff(lampName(i)),
+                                       "switch off " + lampName(i)))
+
+    return NarrationSetting(initial_states={NarrativeState(context)},
+                            choices=choices,
+                            termination_conditions=set())
+
+
+# ======================================================= Actions ======================================================
+
+
+def switchOn(lamp: string):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(lamp, IS_ON, True)
+        return w
+
+    return action
+
+
+def switchOff(lamp: string):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(lamp, IS_ON, False)
+        return w
+
+    return action
+
+
+# ====================================================== Benchmark =====================================================
+
+
+max_lamp_count = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+if processes is None:
+    print("lamps  states  events  seconds")
+else:
+    print("lamps  states  events  seconds  parallel  speedup")
+for lamp_count in range(2, max_lamp_count + 1):
+    setting = buildSetting(lamp_count)
+    start = time.perf_counter()
+    model = generateNarrativeModel(setting, printProcess=False)
+    elapsed = time.perf_counter() - start
+    line = "%5d  %6d  %6d  %7.3f" % (lamp_count, len(model.narrativeGraph.nodes), len(model.eventSet), elapsed)
+    if processes is not None:
+        start = time.perf_counter()
+        generateNarrativeModelInParallel(setting, processes, printProcess=False)
+        parallel_elapsed = time.perf_counter() - start
+        line += "  %8.3f  %7.2f" % (parallel_elapsed, elapsed / parallel_elapsed)
+    print(line)
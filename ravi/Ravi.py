@@ -1,17 +1,37 @@
+import hashlib
+import heapq
 import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import random
+import sqlite3
 import string
+import tempfile
 import textwrap
+import time
+import traceback
+import zlib
+from collections import OrderedDict, deque
 from types import FunctionType
 from copy import copy, deepcopy
 import inspect
+import itertools
+import json
+from enum import Enum
 from typing import List, Dict, Set
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 
 NULL_STRING: string = "NULL"
 CLASS_TYPE: string = "class_type"
 DEFAULT_VALUE: string = "default_value"
 
+# constructing one of these from a value of the same type returns an equal immutable value, so writes skip the call
+IMMUTABLE_VALUE_TYPES = (bool, int, float, complex, str, bytes, tuple, frozenset, type(None))
+
 
 # =========================================================== Sets =====================================================
 
@@ -63,9 +83,30 @@ class PathSet(set):
 # ===================================================== EntityClass =================================================
 
 
+def valueConverter(class_type):
+    if class_type in IMMUTABLE_VALUE_TYPES or (isinstance(class_type, type) and issubclass(class_type, Enum)):
+        return None
+    return class_type
+
+
+def frozenValue(value):
+    # an immutable, hashable stand-in for a list, dict, set or bytearray value, equal when the values are equal; set
+    # and dict entries are put in one fixed order, so that equal values also have the same repr
+    if isinstance(value, list):
+        return tuple(frozenValue(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((frozenValue(item) for item in value), key=repr))
+    if isinstance(value, dict):
+        return tuple(sorted(((key, frozenValue(item)) for key, item in value.items()), key=repr))
+    if isinstance(value, bytearray):
+        return bytes(value)
+    return value
+
+
 class EntityClass(object):
     def __init__(self):
         self._properties = dict()
+        self._layout = None
 
     def __repr__(self):
         return repr(self._properties)
@@ -74,13 +115,15 @@ class EntityClass(object):
         return str(self._properties)
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if not isinstance(other, EntityClass):
+            return False
+        return self._properties == other._properties
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(self._properties)
+        return hash(frozenset(self._properties))
 
     def __copy__(self):
         new = EntityClass()
@@ -92,9 +135,11 @@ class EntityClass(object):
 
     def addProperty(self, property_name: string, class_type, default_value):
         self._properties[property_name] = {CLASS_TYPE: class_type, DEFAULT_VALUE: default_value}
+        self._layout = None
 
     def removeProperty(self, property_name: string):
         del self._properties[property_name]
+        self._layout = None
 
     def changePropertyDefaultValue(self, property_name: string, new_default_value):
         self._properties[property_name][DEFAULT_VALUE] = new_default_value
@@ -103,6 +148,15 @@ class EntityClass(object):
     def properties(self):
         return copy(self._properties)
 
+    @property
+    def layout(self) -> Dict[string, tuple]:
+        # property name -> (column, class type, converter or None), compiled once until a property is added or removed
+        if self._layout is None:
+            self._layout = dict()
+            for column, (property_name, spec) in enumerate(self._properties.items()):
+                self._layout[property_name] = (column, spec[CLASS_TYPE], valueConverter(spec[CLASS_TYPE]))
+        return self._layout
+
 
 def inherit_from(parent: EntityClass) -> EntityClass:
     return deepcopy(parent)
@@ -111,8 +165,11 @@ def inherit_from(parent: EntityClass) -> EntityClass:
 # ===================================================== Narrative Context ==============================================
 
 class NarrativeContext(object):
-    def __init__(self):
+    def __init__(self, packed: bool = False):
         self._entities = dict()
+        self._packed = packed
+        self._symmetries: List[tuple] = []
+        self._schema = None
 
     def __repr__(self):
         return str(self)
@@ -130,14 +187,18 @@ class NarrativeContext(object):
         return h
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if not isinstance(other, NarrativeContext):
+            return False
+        return self._entities == other._entities
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __copy__(self):
-        new = NarrativeContext()
+        new = NarrativeContext(self._packed)
         new._entities = deepcopy(self._entities)
+        new._symmetries = list(self._symmetries)
+        new._schema = self._schema
         return new
 
     def __deepcopy__(self, memo):
@@ -145,21 +206,419 @@ class NarrativeContext(object):
 
     def addEntity(self, entity_name: string, e_class: EntityClass):
         entityT = deepcopy(e_class)
+        # compile slot indexes and validators while the context is built rather than on the first write
+        entityT.layout
         self._entities[entity_name] = entityT
+        self._schema = None
 
     def setDefaultValue(self, entity_name: string, property_name: string, default_value):
         self._entities[entity_name].changePropertyDefaultValue(property_name, default_value)
+        self._schema = None
 
     def removeEntity(self, name: string):
         del self._entities[name]
+        self._symmetries = [tuple(e for e in group if e != name) for group in self._symmetries]
+        self._symmetries = [group for group in self._symmetries if len(group) > 1]
+        self._schema = None
+
+    def addSymmetry(self, entity_names: List[string]):
+        # declares the entities interchangeable: generation keeps one state per permutation of their valuations.
+        # only sound when the choices and termination conditions treat these entities alike, e.g. one choice per guard.
+        # the entities need the same properties of the same types, but may start from different values (defaults set
+        # before or after this call): initial states are replaced by their representative, whose rows of the group are
+        # sorted, so which entity holds which of the starting values is not kept.
+        # the model only holds representatives, so filters and assertions over its states must treat the entities alike
+        # too: a test of one particular entity, such as "guard 1 is bribed", sees whichever entity the sorting put in
+        # its row. findWitness and isReachable test every permutation of a state instead, and so do answer those
+        entity_names = tuple(entity_names)
+        for entity_name in entity_names:
+            if entity_name not in self._entities:
+                raise Exception("Cannot find entity with the name <" + entity_name + ">")
+            if [(property_name, class_type) for property_name, (_, class_type, _)
+                in self._entities[entity_name].layout.items()] != \
+                    [(property_name, class_type) for property_name, (_, class_type, _)
+                     in self._entities[entity_names[0]].layout.items()]:
+                raise TypeError("<" + entity_name + "> is not of the same entity class as <" + entity_names[0] + ">")
+            for group in self._symmetries:
+                if entity_name in group:
+                    raise Exception("<" + entity_name + "> is already declared symmetric")
+        if len(entity_names) > 1:
+            self._symmetries.append(entity_names)
+            self._schema = None
+
+    @property
+    def symmetries(self) -> List[tuple]:
+        return list(self._symmetries)
 
     def doesHaveEntity(self, entity_name: string):
-        return list(self._entities.keys()).count(entity_name) == 1
+        return entity_name in self._entities
 
     @property
     def entities(self):
         return deepcopy(self._entities)
 
+    def setPackedEncoding(self, packed: bool):
+        self._packed = packed
+        self._schema = None
+
+    @property
+    def schema(self):
+        # compiled once and shared by every state built from this context until the context changes
+        if self._schema is None:
+            if self._packed:
+                self._schema = PackedStateSchema(self)
+            else:
+                self._schema = StateSchema(self)
+        return self._schema
+
+
+# ====================================================== State Schema ==================================================
+
+class StateSchema(object):
+    def __init__(self, context: NarrativeContext):
+        entityNames = []
+        labels = []
+        types = []
+        converters = []
+        defaults = []
+        keys = []
+        slots = dict()
+        for entity_name, e_class in context._entities.items():
+            columns = dict()
+            slots[entity_name] = (len(entityNames), columns)
+            entityNames.append(entity_name)
+            row_types = []
+            row_converters = []
+            row_defaults = []
+            row_keys = []
+            for property_name, (column, class_type, converter) in e_class.layout.items():
+                if converter is not None and class_type.__hash__ is None and \
+                        not issubclass(class_type, (list, dict, set, bytearray)):
+                    raise TypeError("<" + property_name + "> must be of a hashable type or a list, dict or set, not " +
+                                    repr(class_type))
+                columns[property_name] = column
+                labels.append((entity_name, property_name))
+                row_types.append(class_type)
+                row_converters.append(converter)
+                row_defaults.append(class_type(e_class._properties[property_name][DEFAULT_VALUE]))
+                # Zobrist key derived from the label so that equally shaped schemas agree on state hashes
+                row_keys.append(hash((entity_name, property_name)))
+            types.append(tuple(row_types))
+            converters.append(tuple(row_converters))
+            defaults.append(tuple(row_defaults))
+            keys.append(tuple(row_keys))
+
+        # values are stored as one row tuple per entity, so a write only duplicates the row of the entity it touches
+        self._entityNames = tuple(entityNames)
+        self._labels = tuple(labels)
+        self._types = tuple(types)
+        self._converters = tuple(converters)
+        self._defaults = tuple(defaults)
+        self._keys = tuple(keys)
+        self._slots: Dict[string, tuple] = slots
+        self._trusted = False
+        # lists, dicts and sets are stored as they are and only hashed, digested and ordered through frozenValue
+        self._mutable = any(converter is not None for row_converters in converters for converter in row_converters)
+        self._symmetries = tuple(tuple(slots[entity_name][0] for entity_name in group)
+                                 for group in context._symmetries)
+
+    def __repr__(self):
+        return repr(self._labels)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return False
+        return self._labels == other._labels and self._types == other._types and \
+               self._symmetries == other._symmetries
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._labels)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def locate(self, entity_name: string, property_name: string, missing_property_message: string) -> tuple:
+        entity = self._slots.get(entity_name)
+        if entity is None:
+            raise Exception("Cannot find entity with the name <" + entity_name + ">")
+        column = entity[1].get(property_name)
+        if column is None:
+            raise Exception(missing_property_message + " <" + property_name + ">")
+        return entity[0], column
+
+    def validate(self, row: int, column: int, property_name: string, value):
+        if self._trusted:
+            return value
+        property_class_type = self._types[row][column]
+        if type(value) is not property_class_type:
+            raise TypeError("<" + property_name + "> must be of type " + repr(property_class_type))
+        converter = self._converters[row][column]
+        if converter is not None:
+            return converter(value)
+        return value
+
+    def read(self, values, entity_name: string, property_name: string):
+        entity = self._slots.get(entity_name)
+        if entity is None:
+            raise Exception("Cannot find entity with the name <" + entity_name + ">")
+        column = entity[1].get(property_name)
+        if column is None:
+            raise Exception("There is no property named <" + property_name + ">")
+        return values[entity[0]][column]
+
+    def write(self, values, h, entity_name: string, property_name: string, value) -> tuple:
+        entity = self._slots.get(entity_name)
+        if entity is None:
+            raise Exception("Cannot find entity with the name <" + entity_name + ">")
+        row, columns = entity
+        column = columns.get(property_name)
+        if column is None:
+            raise Exception("Cannot find property with the name <" + property_name + ">")
+        if not self._trusted:
+            property_class_type = self._types[row][column]
+            if type(value) is not property_class_type:
+                raise TypeError("<" + property_name + "> must be of type " + repr(property_class_type))
+            converter = self._converters[row][column]
+            if converter is not None:
+                value = converter(value)
+        entity_values = values[row]
+        if h is not None:
+            key = self._keys[row][column]
+            if self._converters[row][column] is None:
+                h ^= hash((key, entity_values[column])) ^ hash((key, value))
+            else:
+                h ^= hash((key, frozenValue(entity_values[column]))) ^ hash((key, frozenValue(value)))
+        # copy-on-write: every other entity row stays shared with the states the written one was copied from
+        entity_values = entity_values[:column] + (value,) + entity_values[column + 1:]
+        return values[:row] + (entity_values,) + values[row + 1:], h
+
+    def place(self, values, row: int, column: int, value):
+        # a write without validation or hash update, for a value already stored in this state under another identity
+        entity_values = values[row]
+        return values[:row] + (entity_values[:column] + (value,) + entity_values[column + 1:],) + values[row + 1:]
+
+    def decode(self, values) -> tuple:
+        return values
+
+    def encode(self, rows: tuple):
+        return rows
+
+    def render(self, values) -> string:
+        rows = self.decode(values)
+        s: string = "\n"
+        for entity_name, (row, columns) in self._slots.items():
+            s = s + str(entity_name) + "\n"
+            for property_name, column in columns.items():
+                s = s + "    |---- " + str(property_name) + " = " + str(rows[row][column]) + "\n"
+        return s
+
+    def canonicalize(self, values):
+        # representative of the orbit: the rows of every symmetric group sorted into one fixed order
+        rows = list(self.decode(values))
+        order = repr if not self._mutable else lambda entity_values: repr(tuple(map(frozenValue, entity_values)))
+        for group in self._symmetries:
+            for row, ordered in zip(group, sorted((rows[row] for row in group), key=order)):
+                rows[row] = ordered
+        return self.encode(tuple(rows))
+
+    def permutations(self, values) -> list:
+        # the values of every distinct state the orbit holds: each arrangement of the rows of every symmetric group
+        rows = self.decode(values)
+        arrangements = [list(rows)]
+        for group in self._symmetries:
+            arranged_groups = []
+            for arranged in arrangements:
+                for ordered in itertools.permutations([rows[row] for row in group]):
+                    arranged = list(arranged)
+                    for row, row_values in zip(group, ordered):
+                        arranged[row] = row_values
+                    arranged_groups.append(arranged)
+            arrangements = arranged_groups
+        distinct = OrderedDict()
+        for arranged in arrangements:
+            distinct.setdefault(self.frozenRows(tuple(arranged)), tuple(arranged))
+        return [self.encode(arranged) for arranged in distinct.values()]
+
+    def difference(self, values, other_values) -> Set[tuple]:
+        # (entity, property) pairs whose values differ; rows shared by both states are skipped without a look
+        rows = self.decode(values)
+        other_rows = self.decode(other_values)
+        changed = set()
+        for entity_name, (row, columns) in self._slots.items():
+            if rows[row] is other_rows[row]:
+                continue
+            for property_name, column in columns.items():
+                if rows[row][column] != other_rows[row][column]:
+                    changed.add((entity_name, property_name))
+        return changed
+
+    def frozenRows(self, rows: tuple) -> tuple:
+        # the rows with every list, dict and set value replaced by its frozenValue
+        if not self._mutable:
+            return rows
+        return tuple(tuple(value if converter is None else frozenValue(value)
+                           for converter, value in zip(row_converters, row_values))
+                     for row_converters, row_values in zip(self._converters, rows))
+
+    def hashOf(self, values) -> int:
+        h = 0
+        for row_keys, row_values in zip(self._keys, self.frozenRows(values)):
+            for key, value in zip(row_keys, row_values):
+                h ^= hash((key, value))
+        return h
+
+    @property
+    def entityNames(self):
+        return self._entityNames
+
+    @property
+    def symmetric(self) -> bool:
+        return len(self._symmetries) > 0
+
+    @property
+    def mutable(self) -> bool:
+        return self._mutable
+
+    def isMutable(self, row: int, column: int) -> bool:
+        return self._converters[row][column] is not None
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def types(self):
+        return self._types
+
+    @property
+    def defaults(self):
+        return self._defaults
+
+    @property
+    def initialValues(self):
+        return self._defaults
+
+    def setTrusted(self, trusted: bool):
+        # a trusted schema skips type validation on writes; meant for bulk generation of already validated models
+        self._trusted = trusted
+
+    @property
+    def trusted(self):
+        return self._trusted
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def slots(self):
+        return self._slots
+
+
+class PackedStateSchema(StateSchema):
+    # bool and Enum properties get a bit field of one integer; any other property is kept in a side tuple,
+    # so a state of a fully packable context is a single int and hashing and equality are native int operations
+    def __init__(self, context: NarrativeContext):
+        StateSchema.__init__(self, context)
+        fields = []
+        shift = 0
+        side_count = 0
+        for row_types in self._types:
+            row_fields = []
+            for property_class_type in row_types:
+                if property_class_type is bool:
+                    members = (False, True)
+                elif isinstance(property_class_type, type) and issubclass(property_class_type, Enum):
+                    members = tuple(property_class_type)
+                else:
+                    row_fields.append((None, side_count))
+                    side_count += 1
+                    continue
+                width = max(1, (len(members) - 1).bit_length())
+                codes = {member: code for code, member in enumerate(members)}
+                row_fields.append((shift, (1 << width) - 1, members, codes))
+                shift += width
+            fields.append(tuple(row_fields))
+
+        self._fields = tuple(fields)
+        self._bitCount = shift
+        self._sideCount = side_count
+        self._initialValues = self.encode(self._defaults)
+
+    def read(self, values, entity_name: string, property_name: string):
+        row, column = self.locate(entity_name, property_name, "There is no property named")
+        field = self._fields[row][column]
+        if field[0] is None:
+            return values[field[1] + 1]
+        bits = values if self._sideCount == 0 else values[0]
+        return field[2][(bits >> field[0]) & field[1]]
+
+    def write(self, values, h, entity_name: string, property_name: string, value) -> tuple:
+        row, column = self.locate(entity_name, property_name, "Cannot find property with the name")
+        value = self.validate(row, column, property_name, value)
+        field = self._fields[row][column]
+        if field[0] is None:
+            index = field[1] + 1
+            return values[:index] + (value,) + values[index + 1:], None
+        if self._sideCount == 0:
+            return (values & ~(field[1] << field[0])) | (field[3][value] << field[0]), None
+        bits = (values[0] & ~(field[1] << field[0])) | (field[3][value] << field[0])
+        return (bits,) + values[1:], None
+
+    def place(self, values, row: int, column: int, value):
+        index = self._fields[row][column][1] + 1
+        return values[:index] + (value,) + values[index + 1:]
+
+    def decode(self, values) -> tuple:
+        bits = values if self._sideCount == 0 else values[0]
+        rows = []
+        for row_fields in self._fields:
+            row = []
+            for field in row_fields:
+                if field[0] is None:
+                    row.append(values[field[1] + 1])
+                else:
+                    row.append(field[2][(bits >> field[0]) & field[1]])
+            rows.append(tuple(row))
+        return tuple(rows)
+
+    def encode(self, rows: tuple):
+        bits = 0
+        side = []
+        for row_fields, row in zip(self._fields, rows):
+            for field, value in zip(row_fields, row):
+                if field[0] is None:
+                    side.append(value)
+                else:
+                    bits |= field[3][value] << field[0]
+        if self._sideCount == 0:
+            return bits
+        return (bits,) + tuple(side)
+
+    def hashOf(self, values) -> int:
+        if self._mutable:
+            return hash(self.encode(self.frozenRows(self.decode(values))))
+        return hash(values)
+
+    @property
+    def initialValues(self):
+        return self._initialValues
+
+    @property
+    def bitCount(self):
+        return self._bitCount
+
 
 # ===================================================== Entity Instance ================================================
 
@@ -183,10 +642,12 @@ class Entity(object):
         return s
 
     def __hash__(self):
-        return hash(self._valuation)
+        return hash(frozenset(self._valuation.items()))
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if not isinstance(other, Entity):
+            return False
+        return self._valuation == other._valuation
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -200,18 +661,18 @@ class Entity(object):
         return copy(self)
 
     def doesHaveProperty(self, property_name: string):
-        return list(self._valuation.keys()).count(property_name) == 1
+        return property_name in self._valuation
 
     def setPropertyValue(self, property_name: string, property_value):
-
-        if self.doesHaveProperty(property_name):
-            property_class_type = self._entityClass.properties[property_name][CLASS_TYPE]
-            if property_class_type == type(property_value):
-                self._valuation[property_name] = property_class_type(property_value)
-            else:
-                raise TypeError("<" + property_name + "> must be of type " + repr(property_class_type))
-        else:
+        compiled = self._entityClass.layout.get(property_name)
+        if compiled is None:
             raise Exception("Cannot find property with the name <" + property_name + ">")
+        property_class_type = compiled[1]
+        if type(property_value) is not property_class_type:
+            raise TypeError("<" + property_name + "> must be of type " + repr(property_class_type))
+        if compiled[2] is not None:
+            property_value = compiled[2](property_value)
+        self._valuation[property_name] = property_value
 
     def getPropertyValue(self, property_name: string):
         if self.doesHaveProperty(property_name):
@@ -223,55 +684,539 @@ class Entity(object):
 # ================================================== Narrative World State =============================================
 
 class NarrativeState(object):
+    __slots__ = ('_schema', '_values', '_hash', '_owned')
+
     def __init__(self, context: NarrativeContext):
-        self._context = deepcopy(context)
-        self._entities = dict()
-        for pair in self._context.entities.items():
-            self._entities[pair[0]] = Entity(pair[1])
+        self._schema: StateSchema = context.schema
+        self._values = self._schema.initialValues
+        self._hash = None
+        # (row, column) slots whose list, dict or set value this state copied for itself and shares with no other state
+        self._owned: Set[tuple] = None
 
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        s: string = "\n"
-        for e in self._entities.items():
-            s = s + str(e[0]) + "\n" + str(e[1])
-        return s
+        return self._schema.render(self._values)
 
     def __hash__(self):
-        h = 0
-        for entity in self._entities:
-            h += hash(entity)
+        h = self._hash
+        if h is None:
+            h = self._schema.hashOf(self._values)
+            self._hash = h
         return h
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if self is other:
+            return True
+        if not isinstance(other, NarrativeState):
+            return False
+        if self._hash is not None and other._hash is not None and self._hash != other._hash:
+            return False
+        # states built from one context share a single compiled schema, so the schema comparison is an identity check
+        if self._schema is not other._schema and self._schema != other._schema:
+            return False
+        return self._values == other._values
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __copy__(self):
-        newWorldState = NarrativeState(self._context)
-        newWorldState._entities = deepcopy(self._entities)
+        newWorldState = object.__new__(NarrativeState)
+        newWorldState._schema = self._schema
+        newWorldState._values = self._values
+        newWorldState._hash = self._hash
+        newWorldState._owned = None
+        # both states now share every value, so neither may change one in place any more
+        self._owned = None
         return newWorldState
 
     def __deepcopy__(self, memo):
         return copy(self)
 
+    def __getstate__(self):
+        return self._schema, self._values
+
+    def __setstate__(self, state):
+        # string hashes are salted per process, so the cached hash is never carried across a pickle
+        self._schema, self._values = state
+        self._hash = None
+        self._owned = None
+
     def doesHaveEntity(self, entity_name: string):
-        return list(self._entities.keys()).count(entity_name) == 1
+        return entity_name in self._schema.slots
 
     def setValue(self, entity_name: string, property_name: string, value):
-        if self.doesHaveEntity(entity_name):
-            self._entities[entity_name].setPropertyValue(property_name, value)
-        else:
-            raise Exception("Cannot find entity with the name <" + entity_name + ">")
+        self._values, self._hash = self._schema.write(self._values, self._hash, entity_name, property_name, value)
 
     def getValue(self, entity_name: string, property_name: string):
-        if self.doesHaveEntity(entity_name):
-            return self._entities[entity_name].getPropertyValue(property_name)
-        else:
-            raise Exception("Cannot find entity with the name <" + entity_name + ">")
+        if self._schema.mutable:
+            return self._ownedValue(entity_name, property_name)
+        return self._schema.read(self._values, entity_name, property_name)
+
+    def _ownedValue(self, entity_name: string, property_name: string):
+        # a list, dict or set may be changed in place by whoever reads it, as it could on the deep copies states used to
+        # be, so the state hands out a copy of its own that no other state shares and stops trusting its cached hash
+        value = self._schema.read(self._values, entity_name, property_name)
+        row, column = self._schema.locate(entity_name, property_name, "There is no property named")
+        if not self._schema.isMutable(row, column):
+            return value
+        self._hash = None
+        if self._owned is None or (row, column) not in self._owned:
+            value = deepcopy(value)
+            self._values = self._schema.place(self._values, row, column, value)
+            self._owned = {(row, column)} if self._owned is None else self._owned | {(row, column)}
+        return value
+
+    @property
+    def rows(self) -> tuple:
+        # the values as one tuple per entity, in schema order, whatever the encoding
+        return self._schema.decode(self._values)
+
+    def representative(self) -> 'FrozenNarrativeState':
+        # the frozen state standing for every permutation of this one's symmetric entities
+        if not self._schema.symmetric:
+            return self.frozen()
+        self._owned = None
+        view = object.__new__(FrozenNarrativeState)
+        view._schema = self._schema
+        view._values = self._schema.canonicalize(self._values)
+        view._hash = None if view._values != self._values else self._hash
+        return view
+
+    def orbit(self) -> List['FrozenNarrativeState']:
+        # every state this one stands for under the symmetries, itself included
+        if not self._schema.symmetric:
+            return [self.frozen()]
+        self._owned = None
+        views = []
+        for values in self._schema.permutations(self._values):
+            view = object.__new__(FrozenNarrativeState)
+            view._schema = self._schema
+            view._values = values
+            view._hash = None
+            view._owned = None
+            views.append(view)
+        return views
+
+    def frozen(self) -> 'FrozenNarrativeState':
+        self._owned = None
+        view = object.__new__(FrozenNarrativeState)
+        view._schema = self._schema
+        view._values = self._values
+        view._hash = self._hash
+        view._owned = None
+        return view
+
+    @property
+    def schema(self) -> StateSchema:
+        return self._schema
+
+
+class FrozenNarrativeState(NarrativeState):
+    # read-only snapshot handed to preconditions, termination conditions and filters; copying it yields a mutable state
+    __slots__ = ()
+
+    def frozen(self) -> 'FrozenNarrativeState':
+        return self
+
+    def setValue(self, entity_name: string, property_name: string, value):
+        raise Exception("Cannot set <" + property_name + "> of <" + entity_name + "> on a read-only state")
+
+    def getValue(self, entity_name: string, property_name: string):
+        # a list, dict or set is shared with other states and is never handed out itself
+        value = self._schema.read(self._values, entity_name, property_name)
+        return deepcopy(value) if self._schema.mutable else value
+
+
+class RecordingNarrativeState(NarrativeState):
+    # a mutable copy of a state that logs every (entity, property) pair read from or written to it
+    __slots__ = ('_reads', '_writes', '_readOnly')
+
+    def __init__(self, state: NarrativeState, read_only: bool = False):
+        self._schema = state.schema
+        self._values = state._values
+        self._hash = state._hash
+        self._owned = None
+        self._reads: Set[tuple] = set()
+        self._writes: Set[tuple] = set()
+        self._readOnly = read_only
+
+    def __hash__(self):
+        self._readAll()
+        return NarrativeState.__hash__(self)
+
+    def __eq__(self, other):
+        self._readAll()
+        if isinstance(other, RecordingNarrativeState):
+            other._readAll()
+        return NarrativeState.__eq__(self, other)
+
+    def __str__(self):
+        self._readAll()
+        return NarrativeState.__str__(self)
+
+    def __copy__(self):
+        # a copy logs into the same sets, so reads and writes made through copy(w) or deepcopy(w) are still recorded
+        duplicate = object.__new__(RecordingNarrativeState)
+        duplicate._schema = self._schema
+        duplicate._values = self._values
+        duplicate._hash = self._hash
+        duplicate._owned = None
+        self._owned = None
+        duplicate._reads = self._reads
+        duplicate._writes = self._writes
+        duplicate._readOnly = False
+        return duplicate
+
+    def __getstate__(self):
+        self._readAll()
+        return NarrativeState.__getstate__(self)
+
+    def _readAll(self):
+        # anything that looks at the state as a whole depends on every property
+        self._reads.update(self._schema.labels)
+
+    def frozen(self) -> 'RecordingNarrativeState':
+        return self
+
+    def setValue(self, entity_name: string, property_name: string, value):
+        if self._readOnly:
+            raise Exception("Cannot set <" + property_name + "> of <" + entity_name + "> on a read-only state")
+        self._writes.add((entity_name, property_name))
+        NarrativeState.setValue(self, entity_name, property_name, value)
+
+    def getValue(self, entity_name: string, property_name: string):
+        self._reads.add((entity_name, property_name))
+        if self._schema.mutable and not self._readOnly and \
+                self._schema.isMutable(*self._schema.locate(entity_name, property_name, "There is no property named")):
+            # the list, dict or set handed out can be changed in place, which is a write nothing else would record
+            self._writes.add((entity_name, property_name))
+        return NarrativeState.getValue(self, entity_name, property_name)
+
+    def snapshot(self) -> FrozenNarrativeState:
+        return NarrativeState.frozen(self)
+
+    @property
+    def rows(self) -> tuple:
+        self._readAll()
+        return self._schema.decode(self._values)
+
+    def representative(self) -> FrozenNarrativeState:
+        self._readAll()
+        return NarrativeState.representative(self)
+
+    def orbit(self) -> List[FrozenNarrativeState]:
+        self._readAll()
+        return NarrativeState.orbit(self)
+
+    @property
+    def reads(self) -> Set[tuple]:
+        return self._reads
+
+    @property
+    def writes(self) -> Set[tuple]:
+        return self._writes
+
+
+# ======================================================= State Store ==================================================
+
+class StateStore(object):
+    # interning table: exactly one canonical frozen object per distinct state, numbered densely in discovery order
+    def __init__(self):
+        self._ids: Dict[NarrativeState, int] = dict()
+        self._states: List[FrozenNarrativeState] = []
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, state: NarrativeState):
+        return state in self._ids
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def intern(self, state: NarrativeState) -> FrozenNarrativeState:
+        state_id = self._ids.get(state)
+        if state_id is not None:
+            return self._states[state_id]
+        state = state.frozen()
+        self._ids[state] = len(self._states)
+        self._states.append(state)
+        return state
+
+    def canonical(self, state: NarrativeState):
+        state_id = self._ids.get(state)
+        if state_id is None:
+            return None
+        return self._states[state_id]
+
+    def append(self, state: FrozenNarrativeState) -> FrozenNarrativeState:
+        # for a frozen state known to be missing, such as one merged from another store; it is not looked up
+        self._ids[state] = len(self._states)
+        self._states.append(state)
+        return state
+
+    def idOf(self, state: NarrativeState) -> int:
+        state_id = self._ids.get(state)
+        if state_id is None:
+            raise Exception("The state is not stored in this state store")
+        return state_id
+
+    def stateOf(self, state_id: int) -> FrozenNarrativeState:
+        return self._states[state_id]
+
+
+class DiskStateStore(object):
+    # a StateStore kept in an SQLite file for state spaces larger than memory: states are saved as pickled rows under a
+    # digest of their values, events as (parent id, child id, choice id) rows, and only the most recently used states
+    # stay in memory. Without a path the file is temporary and removed by close
+    def __init__(self, path: string = None, cache_size: int = 65536):
+        self._temporary = path is None
+        if path is None:
+            handle, path = tempfile.mkstemp(suffix=".sqlite")
+            os.close(handle)
+        self._path = path
+        self._cacheSize = cache_size
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS schemas (id INTEGER PRIMARY KEY, labels BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS choices (id INTEGER PRIMARY KEY, label TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS states (id INTEGER PRIMARY KEY, digest INTEGER NOT NULL,
+                                               schema INTEGER NOT NULL, rows BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS states_digest ON states (digest);
+            CREATE TABLE IF NOT EXISTS edges (parent INTEGER NOT NULL, child INTEGER NOT NULL, choice INTEGER NOT NULL,
+                                              PRIMARY KEY (parent, child, choice)) WITHOUT ROWID;
+        """)
+        # schemas are code and cannot be saved: a reopened store learns them again from the states interned into it
+        self._labels: List[tuple] = [pickle.loads(labels) for (labels,) in
+                                     self._connection.execute("SELECT labels FROM schemas ORDER BY id")]
+        self._schemas: List[StateSchema] = [None] * len(self._labels)
+        self._choices: ChoiceTable = None
+        self._cache: OrderedDict = OrderedDict()
+        self._ids: Dict[NarrativeState, int] = dict()
+        self._count: int = self._connection.execute("SELECT COUNT(*) FROM states").fetchone()[0]
+        self._pending = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, state: NarrativeState):
+        return self._lookup(state) is not None
+
+    def __iter__(self):
+        # streamed in id order, a batch of rows at a time
+        for first in range(0, self._count, 1024):
+            for state_id, schema_index, rows in self._connection.execute(
+                    "SELECT id, schema, rows FROM states WHERE id >= ? AND id < ? ORDER BY id", (first, first + 1024)):
+                state = self._cache.get(state_id)
+                yield state if state is not None else self._decode(state_id, schema_index, rows)
+
+    def _digest(self, schema: StateSchema, rows: tuple) -> int:
+        return int.from_bytes(hashlib.blake2b(repr(schema.frozenRows(rows)).encode(), digest_size=8).digest(), "big",
+                              signed=True)
+
+    def _schemaIndex(self, schema: StateSchema, create: bool) -> int:
+        for schema_index, known in enumerate(self._schemas):
+            if known is schema:
+                return schema_index
+        if schema.labels in self._labels:
+            schema_index = self._labels.index(schema.labels)
+            if self._schemas[schema_index] is None:
+                self._schemas[schema_index] = schema
+            return schema_index
+        if not create:
+            return None
+        self._connection.execute("INSERT INTO schemas (id, labels) VALUES (?, ?)",
+                                 (len(self._labels), pickle.dumps(schema.labels, pickle.HIGHEST_PROTOCOL)))
+        self._labels.append(schema.labels)
+        self._schemas.append(schema)
+        return len(self._labels) - 1
+
+    def _decode(self, state_id: int, schema_index: int, rows: bytes) -> FrozenNarrativeState:
+        schema = self._schemas[schema_index]
+        if schema is None:
+            raise Exception("Cannot find the context of stored state <" + str(state_id) + ">, bind the setting first")
+        state = object.__new__(FrozenNarrativeState)
+        state._schema = schema
+        state._values = schema.encode(pickle.loads(rows))
+        state._hash = None
+        self._remember(state_id, state)
+        return state
+
+    def _remember(self, state_id: int, state: FrozenNarrativeState):
+        self._cache[state_id] = state
+        self._ids[state] = state_id
+        if len(self._cache) > self._cacheSize:
+            _, evicted = self._cache.popitem(last=False)
+            del self._ids[evicted]
+
+    def _lookup(self, state: NarrativeState) -> int:
+        state_id = self._ids.get(state)
+        if state_id is not None:
+            self._cache.move_to_end(state_id)
+            return state_id
+        schema_index = self._schemaIndex(state.schema, False)
+        if schema_index is None:
+            return None
+        rows = state.rows
+        for state_id, stored in self._connection.execute("SELECT id, rows FROM states WHERE digest = ? AND schema = ?",
+                                                         (self._digest(state.schema, rows), schema_index)):
+            if pickle.loads(stored) == rows:
+                return state_id
+        return None
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= 65536:
+            self.flush()
+
+    def intern(self, state: NarrativeState) -> FrozenNarrativeState:
+        state_id = self._lookup(state)
+        if state_id is not None:
+            return self.stateOf(state_id)
+        state = state.frozen()
+        rows = state.rows
+        state_id = self._count
+        self._connection.execute("INSERT INTO states (id, digest, schema, rows) VALUES (?, ?, ?, ?)",
+                                 (state_id, self._digest(state.schema, rows), self._schemaIndex(state.schema, True),
+                                  pickle.dumps(rows, pickle.HIGHEST_PROTOCOL)))
+        self._count += 1
+        self._remember(state_id, state)
+        self._written()
+        return state
+
+    def canonical(self, state: NarrativeState):
+        state_id = self._lookup(state)
+        if state_id is None:
+            return None
+        return self.stateOf(state_id)
+
+    def idOf(self, state: NarrativeState) -> int:
+        state_id = self._lookup(state)
+        if state_id is None:
+            raise Exception("The state is not stored in this state store")
+        return state_id
+
+    def stateOf(self, state_id: int) -> FrozenNarrativeState:
+        state = self._cache.get(state_id)
+        if state is not None:
+            self._cache.move_to_end(state_id)
+            return state
+        row = self._connection.execute("SELECT schema, rows FROM states WHERE id = ?", (state_id,)).fetchone()
+        if row is None:
+            raise Exception("Cannot find state <" + str(state_id) + "> in this state store")
+        return self._decode(state_id, row[0], row[1])
+
+    def addEdge(self, parent_id: int, child_id: int, choice_id: int) -> bool:
+        # True if this is the first event between the two states
+        first = self._connection.execute("SELECT 1 FROM edges WHERE parent = ? AND child = ? LIMIT 1",
+                                         (parent_id, child_id)).fetchone() is None
+        self._connection.execute("INSERT OR IGNORE INTO edges (parent, child, choice) VALUES (?, ?, ?)",
+                                 (parent_id, child_id, choice_id))
+        self._written()
+        return first
+
+    def hasEdge(self, parent_id: int, child_id: int, choice_id: int) -> bool:
+        return self._connection.execute("SELECT 1 FROM edges WHERE parent = ? AND child = ? AND choice = ?",
+                                        (parent_id, child_id, choice_id)).fetchone() is not None
+
+    def successors(self, state_id: int) -> List[int]:
+        return [child_id for (child_id,) in
+                self._connection.execute("SELECT DISTINCT child FROM edges WHERE parent = ?", (state_id,))]
+
+    def edges(self):
+        # (parent id, child id, choice id) triples, streamed a batch of parents at a time
+        for first in range(0, self._count, 1024):
+            for edge in self._connection.execute("SELECT parent, child, choice FROM edges "
+                                                 "WHERE parent >= ? AND parent < ?", (first, first + 1024)):
+                yield edge
+
+    def edgeCount(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+
+    def hasEdgesAt(self, state_id: int) -> bool:
+        # edges are indexed by parent only, so the scan for an incoming edge is left for states without outgoing ones
+        for column in ("parent", "child"):
+            if self._connection.execute("SELECT 1 FROM edges WHERE " + column + " = ? LIMIT 1",
+                                        (state_id,)).fetchone() is not None:
+                return True
+        return False
+
+    def hasEdgesBy(self, choice_id: int) -> bool:
+        return self._connection.execute("SELECT 1 FROM edges WHERE choice = ? LIMIT 1", (choice_id,)).fetchone() \
+               is not None
+
+    def bindChoices(self, choices):
+        # choice ids are saved in place of the choices, so a store only works with the choices it was generated with
+        choices = choiceTableOf(choices)
+        labels = choices.labels
+        stored = [label for (label,) in self._connection.execute("SELECT label FROM choices ORDER BY id")]
+        if len(stored) == 0:
+            self._connection.executemany("INSERT INTO choices (id, label) VALUES (?, ?)", enumerate(labels))
+        elif stored != labels:
+            raise Exception("Cannot bind choices that differ from the ones state store <" + self._path + "> holds")
+        self._choices = choices
+
+    def bindSetting(self, setting: 'NarrationSetting'):
+        # needed to read a reopened store: gives back the choices and the contexts its states were built from
+        self.bindChoices(setting.choices)
+        for state in setting.initialStates:
+            self._schemaIndex(state.schema, False)
+
+    def choiceOf(self, choice_id: int) -> 'NarrativeChoice':
+        return self.choices[choice_id]
+
+    def flush(self):
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+        if self._temporary:
+            os.remove(self._path)
+
+    @property
+    def path(self) -> string:
+        return self._path
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # shared with the temporary tables an exploration into this store keeps next to it
+        return self._connection
+
+    @property
+    def choices(self) -> 'ChoiceTable':
+        if self._choices is None:
+            raise Exception("Cannot find the choices of state store <" + self._path + ">, bind the setting first")
+        return self._choices
+
+
+class StoredEventSet(object):
+    # the events of a DiskStateStore, read from disk on every iteration instead of being held in an EventSet
+    def __init__(self, store: DiskStateStore):
+        self._store = store
+
+    def __len__(self):
+        return self._store.edgeCount()
+
+    def __iter__(self):
+        for parent_id, child_id, choice_id in self._store.edges():
+            yield NarrativeEvent(self._store.stateOf(parent_id), self._store.stateOf(child_id),
+                                 self._store.choiceOf(choice_id))
+
+    def __contains__(self, event: 'NarrativeEvent'):
+        if not isinstance(event, NarrativeEvent) or event.Choice not in self._store.choices:
+            return False
+        if event.PreState not in self._store or event.PostState not in self._store:
+            return False
+        return self._store.hasEdge(self._store.idOf(event.PreState), self._store.idOf(event.PostState),
+                                   self._store.choices.idOf(event.Choice))
+
+    @property
+    def store(self) -> DiskStateStore:
+        return self._store
 
 
 # ===================================================== NarrativeChoice ================================================
@@ -291,6 +1236,14 @@ class NarrativeChoice(object):
         else:
             raise TypeError("Invalid action function signature")
 
+        # (entity, property) pairs touched by the precondition and the action; None until inferred or if unknown.
+        # declarative guards and effects know them up front
+        self._guard_reads: Set[tuple] = None
+        self._action_reads: Set[tuple] = None
+        self._writes: Set[tuple] = None
+        if self.isDeclarative:
+            self.setAccessSets(pre_condition.reads, action.reads, action.writes)
+
     def __str__(self):
         return self._friendlyName
 
@@ -300,14 +1253,652 @@ class NarrativeChoice(object):
     def __hash__(self):
         return hash(self._friendlyName) + hash(self._pre_condition) + hash(self._action)
 
-    def __eq__(self, other):
-        return hash(self) == hash(other)
+    def __eq__(self, other):
+        return hash(self) == hash(other)
+
+    def PreCondition(self, w: NarrativeState) -> bool:
+        return self._pre_condition(w.frozen())
+
+    def Action(self, w: NarrativeState) -> NarrativeState:
+        return self._action(copy(w))
+
+    def exportDataDictionary(self):
+        return {"choice": self._friendlyName,
+                "guard": exportDeclarative(self._pre_condition),
+                "effect": exportDeclarative(self._action)}
+
+    @property
+    def isDeclarative(self) -> bool:
+        return getattr(self._pre_condition, "reads", None) is not None and \
+               getattr(self._action, "reads", None) is not None and \
+               getattr(self._action, "writes", None) is not None
+
+    def setAccessSets(self, guard_reads: Set[tuple], action_reads: Set[tuple], writes: Set[tuple]):
+        self._guard_reads = None if guard_reads is None else frozenset(guard_reads)
+        self._action_reads = None if action_reads is None else frozenset(action_reads)
+        self._writes = None if writes is None else frozenset(writes)
+
+    @property
+    def guardReadSet(self) -> Set[tuple]:
+        return self._guard_reads
+
+    @property
+    def actionReadSet(self) -> Set[tuple]:
+        return self._action_reads
+
+    @property
+    def readSet(self) -> Set[tuple]:
+        if self._guard_reads is None or self._action_reads is None:
+            return None
+        return self._guard_reads | self._action_reads
+
+    @property
+    def writeSet(self) -> Set[tuple]:
+        return self._writes
+
+
+# ========================================================= Guards =====================================================
+
+
+class Guard(object):
+    # a precondition written as a conjunction of property == value tests, optionally followed by an arbitrary
+    # predicate; it can be passed to NarrativeChoice wherever a precondition function is expected
+    def __init__(self, conditions: Dict[tuple, object] = None, predicate: FunctionType = None):
+        self._conditions: tuple = tuple((conditions or dict()).items())
+        self._predicate: FunctionType = predicate
+        self._keys = frozenset(key for key, _ in self._conditions)
+
+    def __call__(self, w: NarrativeState) -> bool:
+        for (entity_name, property_name), value in self._conditions:
+            if w.getValue(entity_name, property_name) != value:
+                return False
+        return self._predicate is None or self._predicate(w)
+
+    def __str__(self):
+        tests = [entity_name + "." + property_name + " == " + str(value)
+                 for (entity_name, property_name), value in self._conditions]
+        if self._predicate is not None:
+            tests.append(getattr(self._predicate, "__name__", str(self._predicate)))
+        return " and ".join(tests)
+
+    def __repr__(self):
+        return str(self)
+
+    def __hash__(self):
+        return hash((frozenset((key, typedValue(frozenValue(value))) for key, value in self._conditions),
+                     self._predicate))
+
+    def __eq__(self, other):
+        # guards are immutable and compared by value, so choices built on them still equal their (deep) copies
+        if not isinstance(other, Guard):
+            return False
+        return dict((key, typedValue(value)) for key, value in self._conditions) == \
+               dict((key, typedValue(value)) for key, value in other._conditions) and \
+               self._predicate == other._predicate
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def testPredicate(self, w: NarrativeState) -> bool:
+        return self._predicate is None or self._predicate(w)
+
+    def exportDataDictionary(self):
+        return {
+            "conditions": [{"entity": entity_name, "property": property_name, "value": exportValue(value)}
+                           for (entity_name, property_name), value in self._conditions],
+            "predicate": None if self._predicate is None else exportDeclarative(self._predicate),
+        }
+
+    @property
+    def conditions(self) -> Dict[tuple, object]:
+        return dict(self._conditions)
+
+    @property
+    def predicate(self) -> FunctionType:
+        return self._predicate
+
+    @property
+    def keys(self) -> Set[tuple]:
+        return self._keys
+
+    @property
+    def reads(self) -> Set[tuple]:
+        # every property the guard can read, or None when the predicate is an opaque function
+        if self._predicate is None:
+            return self._keys
+        predicate_reads = getattr(self._predicate, "reads", None)
+        return None if predicate_reads is None else self._keys | predicate_reads
+
+
+class GuardIndex(object):
+    # decision tree over the equality tests of Guard preconditions: every node switches on the property tested by most
+    # of the guards left, so one walk per state visits only the guards whose tests all hold; other preconditions are
+    # kept aside and always evaluated
+    def __init__(self, choices: List[NarrativeChoice]):
+        self._guards: Dict[int, Guard] = dict()
+        self._unindexed: List[int] = []
+        entries = []
+        for choice_id in range(len(choices)):
+            pre_condition = choices[choice_id]._pre_condition
+            if isinstance(pre_condition, Guard):
+                self._guards[choice_id] = pre_condition
+                entries.append((choice_id, pre_condition.conditions))
+            else:
+                self._unindexed.append(choice_id)
+        self._choices = choices
+        self._root = self._build(entries)
+
+    def _build(self, entries: List[tuple]) -> tuple:
+        matched = [choice_id for choice_id, remaining in entries if len(remaining) == 0]
+        pending = [entry for entry in entries if len(entry[1]) > 0]
+        if len(pending) == 0:
+            return None, None, None, matched
+
+        counts = dict()
+        for _, remaining in pending:
+            for key in remaining:
+                counts[key] = counts.get(key, 0) + 1
+        key = max(counts, key=lambda k: counts[k])
+
+        groups = dict()
+        rest = []
+        for choice_id, remaining in pending:
+            if key in remaining:
+                remaining = dict(remaining)
+                value = remaining.pop(key)
+                groups.setdefault(value, []).append((choice_id, remaining))
+            else:
+                rest.append((choice_id, remaining))
+
+        branches = {value: self._build(group) for value, group in groups.items()}
+        return key, branches, self._build(rest) if len(rest) > 0 else None, matched
+
+    def candidates(self, w: NarrativeState) -> Set[int]:
+        # ids of the guarded choices whose equality tests all hold on w; their predicates are not evaluated
+        found = set()
+        nodes = [self._root]
+        while len(nodes) > 0:
+            key, branches, rest, matched = nodes.pop()
+            found.update(matched)
+            if key is None:
+                continue
+            branch = branches.get(w.getValue(key[0], key[1]))
+            if branch is not None:
+                nodes.append(branch)
+            if rest is not None:
+                nodes.append(rest)
+        return found
+
+    def enabledIds(self, w: NarrativeState) -> List[int]:
+        w = w.frozen()
+        enabled = [choice_id for choice_id in self.candidates(w) if self._guards[choice_id].testPredicate(w)]
+        enabled.extend(choice_id for choice_id in self._unindexed if self._choices[choice_id].PreCondition(w))
+        return sorted(enabled)
+
+    def guardOf(self, choice_id: int) -> Guard:
+        return self._guards.get(choice_id)
+
+    @property
+    def guardCount(self) -> int:
+        return len(self._guards)
+
+
+# ================================================== Declarative Choices ===============================================
+
+# guards and effects written as data instead of functions: they are callable like the functions they replace, so they
+# mix freely with Python preconditions and actions, but their reads and writes are known without running them and
+# they can be exported to and imported from JSON data dictionaries (saveChoices / loadChoices). The GUI keeps its own
+# save format and still generates Python code
+
+
+def typedValue(value):
+    # what declarative elements compare values by: True, 1 and 1.0 are equal in Python but are not the same value
+    if isinstance(value, (tuple, frozenset)):
+        return type(value), type(value)(typedValue(item) for item in value)
+    return type(value), value
+
+
+PROPERTY_TESTS = {
+    "==": lambda value, operand: value == operand,
+    "!=": lambda value, operand: value != operand,
+    "in": lambda value, operand: value in operand,
+    "not in": lambda value, operand: value not in operand,
+}
+
+
+class PropertyTest(object):
+    # the declarative elements are immutable and compared by structure, so a choice built from them equals its
+    # (deep) copies and the same choice loaded back from JSON
+    def __init__(self, entity_name: string, property_name: string, operator: string, operand):
+        if operator not in PROPERTY_TESTS:
+            raise Exception("Cannot find property test with the name <" + operator + ">")
+        if operator in ("in", "not in"):
+            operand = frozenset(operand)
+        self._entityName = entity_name
+        self._propertyName = property_name
+        self._operator = operator
+        self._operand = operand
+        self._test = PROPERTY_TESTS[operator]
+
+    def __call__(self, w: NarrativeState) -> bool:
+        return self._test(w.getValue(self._entityName, self._propertyName), self._operand)
+
+    def __str__(self):
+        return self._entityName + "." + self._propertyName + " " + self._operator + " " + str(self._operand)
+
+    def __repr__(self):
+        return str(self)
+
+    def __hash__(self):
+        return hash((self._entityName, self._propertyName, self._operator, typedValue(frozenValue(self._operand))))
+
+    def __eq__(self, other):
+        if not isinstance(other, PropertyTest):
+            return False
+        return (self._entityName, self._propertyName, self._operator, typedValue(self._operand)) == \
+               (other._entityName, other._propertyName, other._operator, typedValue(other._operand))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def exportDataDictionary(self):
+        operand = sorted((exportValue(value) for value in self._operand), key=str) \
+            if self._operator in ("in", "not in") else exportValue(self._operand)
+        return {"test": self._operator, "entity": self._entityName, "property": self._propertyName, "value": operand}
+
+    @property
+    def entityName(self) -> string:
+        return self._entityName
+
+    @property
+    def propertyName(self) -> string:
+        return self._propertyName
+
+    @property
+    def operator(self) -> string:
+        return self._operator
+
+    @property
+    def operand(self):
+        return self._operand
+
+    @property
+    def reads(self) -> Set[tuple]:
+        return frozenset({(self._entityName, self._propertyName)})
+
+
+class Conjunction(object):
+    def __init__(self, *terms):
+        self._terms: tuple = terms
+
+    def __call__(self, w: NarrativeState) -> bool:
+        for term in self._terms:
+            if not term(w):
+                return False
+        return True
+
+    def __str__(self):
+        return " and ".join(str(term) for term in self._terms)
+
+    def __repr__(self):
+        return str(self)
+
+    def __hash__(self):
+        return hash(self._terms)
+
+    def __eq__(self, other):
+        if not isinstance(other, Conjunction):
+            return False
+        return self._terms == other._terms
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def exportDataDictionary(self):
+        return {"all": [exportDeclarative(term) for term in self._terms]}
+
+    @property
+    def terms(self) -> tuple:
+        return self._terms
+
+    @property
+    def reads(self) -> Set[tuple]:
+        reads = frozenset()
+        for term in self._terms:
+            term_reads = getattr(term, "reads", None)
+            if term_reads is None:
+                return None
+            reads = reads | term_reads
+        return reads
+
+
+class Assign(object):
+    def __init__(self, entity_name: string, property_name: string, value):
+        self._entityName = entity_name
+        self._propertyName = property_name
+        self._value = value
+
+    def __call__(self, w: NarrativeState) -> NarrativeState:
+        w.setValue(self._entityName, self._propertyName, self._value)
+        return w
+
+    def __str__(self):
+        return self._entityName + "." + self._propertyName + " = " + str(self._value)
+
+    def __repr__(self):
+        return str(self)
+
+    def __hash__(self):
+        # choices compare by hash, so the hash has to tell typed values apart as well
+        return hash((self._entityName, self._propertyName, typedValue(frozenValue(self._value))))
+
+    def __eq__(self, other):
+        if not isinstance(other, Assign):
+            return False
+        return (self._entityName, self._propertyName, typedValue(self._value)) == \
+               (other._entityName, other._propertyName, typedValue(other._value))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def exportDataDictionary(self):
+        return {"assign": {"entity": self._entityName, "property": self._propertyName,
+                           "value": exportValue(self._value)}}
+
+    @property
+    def entityName(self) -> string:
+        return self._entityName
+
+    @property
+    def propertyName(self) -> string:
+        return self._propertyName
+
+    @property
+    def value(self):
+        return self._value
+
+    @property
+    def reads(self) -> Set[tuple]:
+        return frozenset()
+
+    @property
+    def writes(self) -> Set[tuple]:
+        return frozenset({(self._entityName, self._propertyName)})
+
+
+class Effect(object):
+    # a sequence of assignments and/or action functions, applied in order to the state handed to the action
+    def __init__(self, *steps):
+        self._steps: tuple = steps
+
+    def __call__(self, w: NarrativeState) -> NarrativeState:
+        for step in self._steps:
+            w = step(w)
+        return w
+
+    def __str__(self):
+        return ", ".join(str(step) for step in self._steps)
+
+    def __repr__(self):
+        return str(self)
+
+    def __hash__(self):
+        return hash(self._steps)
+
+    def __eq__(self, other):
+        if not isinstance(other, Effect):
+            return False
+        return self._steps == other._steps
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def exportDataDictionary(self):
+        return {"effect": [exportDeclarative(step) for step in self._steps]}
+
+    @property
+    def steps(self) -> tuple:
+        return self._steps
+
+    @property
+    def reads(self) -> Set[tuple]:
+        reads = frozenset()
+        for step in self._steps:
+            step_reads = getattr(step, "reads", None)
+            if step_reads is None:
+                return None
+            reads = reads | step_reads
+        return reads
+
+    @property
+    def writes(self) -> Set[tuple]:
+        writes = frozenset()
+        for step in self._steps:
+            step_writes = getattr(step, "writes", None)
+            if step_writes is None:
+                return None
+            writes = writes | step_writes
+        return writes
+
+
+def equals(entity_name: string, property_name: string, value) -> PropertyTest:
+    return PropertyTest(entity_name, property_name, "==", value)
+
+
+def notEquals(entity_name: string, property_name: string, value) -> PropertyTest:
+    return PropertyTest(entity_name, property_name, "!=", value)
+
+
+def isIn(entity_name: string, property_name: string, values) -> PropertyTest:
+    return PropertyTest(entity_name, property_name, "in", values)
+
+
+def isNotIn(entity_name: string, property_name: string, values) -> PropertyTest:
+    return PropertyTest(entity_name, property_name, "not in", values)
+
+
+def assign(entity_name: string, property_name: string, value) -> Assign:
+    return Assign(entity_name, property_name, value)
+
+
+def guardOf(*terms) -> Guard:
+    # equality tests become indexable Guard conditions, everything else is checked afterwards in the given order
+    conditions = dict()
+    rest = []
+    for term in terms:
+        if isinstance(term, PropertyTest) and term.operator == "==" and \
+                (term.entityName, term.propertyName) not in conditions:
+            conditions[(term.entityName, term.propertyName)] = term.operand
+        else:
+            rest.append(term)
+    if len(rest) == 0:
+        return Guard(conditions)
+    return Guard(conditions, rest[0] if len(rest) == 1 else Conjunction(*rest))
+
+
+def effectOf(*steps) -> Effect:
+    return Effect(*steps)
+
+
+def exportValue(value):
+    if isinstance(value, Enum):
+        return {"enum": type(value).__name__, "member": value.name}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError("Cannot export value <" + str(value) + "> of type " + type(value).__name__)
+
+
+def importValue(data, enums: Dict[string, type] = None):
+    if isinstance(data, dict):
+        if enums is None or data["enum"] not in enums:
+            raise Exception("Cannot find enum with the name <" + data["enum"] + ">")
+        return enums[data["enum"]][data["member"]]
+    return data
+
+
+def exportDeclarative(element):
+    if not hasattr(element, "exportDataDictionary"):
+        raise TypeError("Cannot export <" + str(element) + ">: only declarative guards and effects can be exported")
+    return element.exportDataDictionary()
+
+
+def importDeclarative(data, enums: Dict[string, type] = None):
+    # rebuilds any guard, test, conjunction, assignment, effect or choice from its exported data dictionary
+    if "choice" in data:
+        return NarrativeChoice(importDeclarative(data["guard"], enums),
+                               importDeclarative(data["effect"], enums),
+                               data["choice"])
+    if "conditions" in data:
+        conditions = {(condition["entity"], condition["property"]): importValue(condition["value"], enums)
+                      for condition in data["conditions"]}
+        predicate = None if data["predicate"] is None else importDeclarative(data["predicate"], enums)
+        return Guard(conditions, predicate)
+    if "test" in data:
+        if data["test"] in ("in", "not in"):
+            operand = [importValue(value, enums) for value in data["value"]]
+        else:
+            operand = importValue(data["value"], enums)
+        return PropertyTest(data["entity"], data["property"], data["test"], operand)
+    if "all" in data:
+        return Conjunction(*[importDeclarative(term, enums) for term in data["all"]])
+    if "assign" in data:
+        return Assign(data["assign"]["entity"], data["assign"]["property"],
+                      importValue(data["assign"]["value"], enums))
+    if "effect" in data:
+        return Effect(*[importDeclarative(step, enums) for step in data["effect"]])
+    raise Exception("Cannot find declarative element for <" + str(data) + ">")
+
+
+def saveChoices(file_path: string, choices):
+    with open(file_path, 'w') as json_file:
+        json.dump([exportDeclarative(ch) for ch in choiceTableOf(choices)], json_file, indent=4)
+
+
+def loadChoices(file_path: string, enums: Dict[string, type] = None) -> List[NarrativeChoice]:
+    with open(file_path, 'r') as json_file:
+        return [importDeclarative(data, enums) for data in json.load(json_file)]
+
+
+# ======================================================= Choice Table =================================================
+
+
+class ChoiceTable(object):
+    # the choices of a narrative in a fixed order, numbered 0..n-1; lists keep the order they were given in, sets are
+    # sorted by friendly name, so enumeration does not depend on set iteration order
+    def __init__(self, choices=()):
+        if isinstance(choices, (set, frozenset)):
+            choices = sorted(choices, key=lambda ch: str(ch))
+        self._choices: List[NarrativeChoice] = []
+        self._ids: Dict[NarrativeChoice, int] = dict()
+        self._guardIndex: GuardIndex = None
+        for ch in choices:
+            self.addChoice(ch)
+
+    def __len__(self):
+        return len(self._choices)
+
+    def __iter__(self):
+        return iter(self._choices)
+
+    def __contains__(self, choice: NarrativeChoice):
+        return choice in self._ids
+
+    def __getitem__(self, choice_id: int) -> NarrativeChoice:
+        return self._choices[choice_id]
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def addChoice(self, choice: NarrativeChoice) -> int:
+        if choice not in self._ids:
+            self._ids[choice] = len(self._choices)
+            self._choices.append(choice)
+            self._guardIndex = None
+        return self._ids[choice]
+
+    def idOf(self, choice: NarrativeChoice) -> int:
+        if choice not in self._ids:
+            raise Exception("Cannot find choice with the name <" + str(choice) + ">")
+        return self._ids[choice]
+
+    def choiceOf(self, choice_id: int) -> NarrativeChoice:
+        return self._choices[choice_id]
+
+    def enabledIds(self, w: NarrativeState) -> List[int]:
+        if self.guardIndex.guardCount > 0:
+            return self.guardIndex.enabledIds(w)
+        w = w.frozen()
+        return [i for i in range(len(self._choices)) if self._choices[i].PreCondition(w)]
+
+    def enabledMask(self, w: NarrativeState) -> int:
+        mask = 0
+        for i in self.enabledIds(w):
+            mask |= 1 << i
+        return mask
+
+    def idsOf(self, mask: int) -> List[int]:
+        return [i for i in range(len(self._choices)) if mask & (1 << i)]
+
+    def choicesOf(self, ids) -> List[NarrativeChoice]:
+        if isinstance(ids, int):
+            ids = self.idsOf(ids)
+        return [self._choices[i] for i in ids]
+
+    @property
+    def guardIndex(self) -> GuardIndex:
+        if self._guardIndex is None:
+            self._guardIndex = GuardIndex(self._choices)
+        return self._guardIndex
+
+    @property
+    def choices(self) -> List[NarrativeChoice]:
+        return list(self._choices)
+
+    @property
+    def labels(self) -> List[string]:
+        # the friendly names, which stand for the choices wherever they are saved and so must tell them all apart
+        labels = [str(ch) for ch in self._choices]
+        for label in labels:
+            if labels.count(label) > 1:
+                raise Exception("Cannot save the choices by name: <" + label + "> names more than one choice")
+        return labels
 
-    def PreCondition(self, w: NarrativeState) -> bool:
-        return self._pre_condition(copy(w))
 
-    def Action(self, w: NarrativeState) -> NarrativeState:
-        return self._action(copy(w))
+def choiceTableOf(choices) -> ChoiceTable:
+    return choices if isinstance(choices, ChoiceTable) else ChoiceTable(choices)
 
 
 # ====================================================== NarrativeEvent ================================================
@@ -424,6 +2015,8 @@ class NarrationSetting(object):
         self.initialStates: Set[NarrativeState] = initial_states
         self.choices: Set[NarrativeChoice] = choices
         self.terminationConditions: Set[FunctionType] = termination_conditions
+        # (entity, property) pairs read by the termination conditions; None until inferred or if unknown
+        self.terminationReadSet: Set[tuple] = None
 
     def __str__(self):
         return "[" + str(self.initialStates) + "," + str(self.choices) + "," + str(self.terminationConditions) + "]"
@@ -450,12 +2043,27 @@ class NarrativeModel(object):
                  termination_conditions: Set[FunctionType],
                  choices: Set[NarrativeChoice],
                  event_set: EventSet,
-                 narrative_graph: nx.DiGraph):
-
-        self._initialWorldStates: Set[NarrativeState] = set(deepcopy(initial_states))
-        self._terminationStates: Set[NarrativeState] = set(deepcopy(termination_states))
+                 narrative_graph: nx.DiGraph,
+                 state_store: StateStore = None,
+                 choice_table: ChoiceTable = None,
+                 frontier_states: Set[NarrativeState] = None,
+                 report: 'GenerationReport' = None):
+
+        if state_store is None:
+            state_store = StateStore()
+            for state in narrative_graph.nodes:
+                state_store.intern(state)
+
+        # frozen snapshots instead of deep copies, so states produced by generation stay the canonical objects
+        self._initialWorldStates: Set[NarrativeState] = set(state.frozen() for state in initial_states)
+        self._terminationStates: Set[NarrativeState] = set(state.frozen() for state in termination_states)
         self._choices: Set[NarrativeChoice] = choices
+        self._choiceTable: ChoiceTable = choice_table if choice_table is not None else choiceTableOf(choices)
         self._narrativeGraph: nx.DiGraph = narrative_graph
+        self._stateStore: StateStore = state_store
+        # states left unexpanded because generation ran out of budget: they have no successors yet, but are no dead ends
+        self._frontierStates: Set[NarrativeState] = set(state.frozen() for state in (frontier_states or set()))
+        self._report: GenerationReport = report
         self._dead_ends: Set[NarrativeState] = self._findDeadEnds()
         self._terminationConditions: Set[FunctionType] = termination_conditions
         self._eventSet: EventSet = event_set
@@ -478,18 +2086,19 @@ class NarrativeModel(object):
     def _findDeadEnds(self) -> Set[NarrativeState]:
         dead_ends: Set[NarrativeState] = StateSet()
         for state in list(self._narrativeGraph.nodes):
-            if self._narrativeGraph.out_degree[state] == 0 and not (state in self._terminationStates):
+            if self._narrativeGraph.out_degree[state] == 0 and not (state in self._terminationStates) and \
+                    not (state in self._frontierStates):
                 dead_ends.add(state)
         return dead_ends
 
     def runNarration(self, show_state: bool, initial_world_state: NarrativeState):
         current_state: NarrativeState = deepcopy(initial_world_state)
-        choices = self._choices
+        choices = self._choiceTable
         print("")
         print("--- Begin: Running Interactive Narration ---")
         if show_state:
             print(initial_world_state)
-        while len(getPossibleChoices(current_state, choices)) > 0 and not (current_state in self._terminationStates):
+        while len(getPossibleChoices(current_state, choices)) > 0 and not self.isTerminal(current_state):
             current_state = interactiveStep(show_state, current_state, choices)
 
     def drawNarrationGraph(self, show_state: bool, show_choices: bool, show_plot: bool = True,
@@ -662,10 +2271,26 @@ class NarrativeModel(object):
     def choices(self) -> Set[NarrativeChoice]:
         return deepcopy(self._choices)
 
+    @property
+    def choiceTable(self) -> ChoiceTable:
+        return self._choiceTable
+
     @property
     def deadEnds(self):
         return deepcopy(self._dead_ends)
 
+    @property
+    def frontierStates(self):
+        return deepcopy(self._frontierStates)
+
+    @property
+    def isComplete(self) -> bool:
+        return len(self._frontierStates) == 0
+
+    @property
+    def report(self) -> 'GenerationReport':
+        return self._report
+
     @property
     def terminationConditions(self):
         return self._terminationConditions
@@ -676,25 +2301,157 @@ class NarrativeModel(object):
                 return False
         return True
 
+    def isTerminal(self, state: NarrativeState) -> bool:
+        # a state outside the model, such as an initial state that ends the story at once, is tested against the
+        # termination conditions, as LazyNarrativeModel does for the states it has not reached
+        state = state.representative()
+        if self._narrativeGraph.has_node(state):
+            return state in self._terminationStates
+        return checkForTermination(state, self._terminationConditions)
+
+    def successors(self, state: NarrativeState) -> List[NarrativeState]:
+        state = state.representative()
+        if not self._narrativeGraph.has_node(state):
+            raise Exception("The state is not a state of this narrative model")
+        return list(self._narrativeGraph.successors(state))
+
+    def eventsFrom(self, state: NarrativeState) -> EventSet:
+        state = state.representative()
+        to_ret = EventSet()
+        for child in self.successors(state):
+            for ch in self._narrativeGraph[state][child]["choices"]:
+                to_ret.add(NarrativeEvent(state, child, ch))
+        return to_ret
+
     @property
     def eventSet(self):
         return self._eventSet
 
+    @property
+    def stateStore(self) -> StateStore:
+        return self._stateStore
+
+    def stateId(self, state: NarrativeState) -> int:
+        return self._stateStore.idOf(state)
+
+    def stateById(self, state_id: int) -> NarrativeState:
+        return copy(self._stateStore.stateOf(state_id))
+
     @property
     def assertions(self):
         return self._assertions
 
 
+class LazyNarrativeModel(NarrativeModel):
+    # a model whose graph grows on demand: the successors of a state are computed, and kept, the first time a query or
+    # a play session asks for them. successors, eventsFrom, isTerminal and runNarration explore only what they touch;
+    # narrativeGraph, eventSet, terminationStates and deadEnds, and the processing functions built on them, need the
+    # whole model and explore everything reachable first. frontierStates are the states found but not expanded yet
+    def __init__(self, setting: NarrationSetting):
+        self._initialWorldStates: Set[NarrativeState] = set()
+        self._terminationStates: Set[NarrativeState] = set()
+        self._choices: Set[NarrativeChoice] = deepcopy(setting.choices)
+        self._choiceTable: ChoiceTable = choiceTableOf(setting.choices)
+        self._narrativeGraph: nx.DiGraph = nx.DiGraph()
+        self._stateStore: StateStore = StateStore()
+        self._frontierStates: Set[NarrativeState] = set()
+        self._report: GenerationReport = None
+        self._dead_ends: Set[NarrativeState] = StateSet()
+        self._terminationConditions: Set[FunctionType] = deepcopy(setting.terminationConditions)
+        self._eventSet: EventSet = EventSet()
+        for root in setting.initialStates:
+            root = root.representative()
+            if not checkForTermination(root, self._terminationConditions):
+                self._initialWorldStates.add(self._discover(root))
+
+    def _discover(self, state: NarrativeState) -> FrozenNarrativeState:
+        canonical_state = self._stateStore.canonical(state)
+        if canonical_state is not None:
+            return canonical_state
+        state = self._stateStore.intern(state)
+        self._narrativeGraph.add_node(state)
+        if checkForTermination(state, self._terminationConditions):
+            self._terminationStates.add(state)
+        else:
+            self._frontierStates.add(state)
+        return state
+
+    def expand(self, state: NarrativeState) -> FrozenNarrativeState:
+        # termination states are never expanded, as in generateNarrativeModel
+        canonical_state = self._stateStore.canonical(state.representative())
+        if canonical_state is None:
+            raise Exception("The state is not a state of this narrative model")
+        if canonical_state not in self._frontierStates:
+            return canonical_state
+        self._frontierStates.remove(canonical_state)
+        for choice_id in self._choiceTable.enabledIds(canonical_state):
+            ch = self._choiceTable[choice_id]
+            child = self._discover(ch.Action(canonical_state).representative())
+            if self._narrativeGraph.has_edge(canonical_state, child):
+                self._narrativeGraph[canonical_state][child]["choices"].add(ch)
+            else:
+                self._narrativeGraph.add_edge(canonical_state, child, choices={ch})
+            self._eventSet.add(NarrativeEvent(canonical_state, child, ch))
+        if len(self._frontierStates) == 0:
+            self._dead_ends = self._findDeadEnds()
+        return canonical_state
+
+    def expandAll(self):
+        while len(self._frontierStates) > 0:
+            self.expand(next(iter(self._frontierStates)))
+
+    def isTerminal(self, state: NarrativeState) -> bool:
+        # also answers for states not reached yet, which is what an interactive session steps into
+        return checkForTermination(state, self._terminationConditions)
+
+    def successors(self, state: NarrativeState) -> List[NarrativeState]:
+        return list(self._narrativeGraph.successors(self.expand(state)))
+
+    def eventsFrom(self, state: NarrativeState) -> EventSet:
+        return NarrativeModel.eventsFrom(self, self.expand(state))
+
+    def hasAbsoluteTermination(self):
+        self.expandAll()
+        return NarrativeModel.hasAbsoluteTermination(self)
+
+    @property
+    def narrativeGraph(self):
+        self.expandAll()
+        return deepcopy(self._narrativeGraph)
+
+    @property
+    def terminationStates(self):
+        self.expandAll()
+        return deepcopy(self._terminationStates)
+
+    @property
+    def deadEnds(self):
+        self.expandAll()
+        return deepcopy(self._dead_ends)
+
+    @property
+    def eventSet(self):
+        self.expandAll()
+        return self._eventSet
+
+
 # ======================================================= Generation ===================================================
 
+# kinds of the updates streamed by iterateNarrative and passed to the listener of a NarrativeExplorer
+STATE_DISCOVERED: string = "state"
+EVENT_DISCOVERED: string = "event"
+TERMINATION_REACHED: string = "termination"
+DEAD_END_REACHED: string = "dead end"
+
 
 def getPossibleChoices(w: NarrativeState, choices: Set[NarrativeChoice]) -> Dict[int, NarrativeChoice]:
+    # pass a ChoiceTable when calling repeatedly; a plain collection is compiled into one on every call
+    table = choiceTableOf(choices)
     choice_indices = dict()
     counter = 0
-    for i in range(len(choices)):
-        if list(choices)[i].PreCondition(w):
-            choice_indices[counter] = list(choices)[i]
-            counter += 1
+    for choice_id in table.enabledIds(w):
+        choice_indices[counter] = table[choice_id]
+        counter += 1
     return choice_indices
 
 
@@ -712,75 +2469,1016 @@ def interactiveStep(show_state: bool, current_world: NarrativeState,
 
 
 def checkForTermination(state: NarrativeState, term_conditions: Set[FunctionType]) -> bool:
+    state = state.frozen()
     for condition in term_conditions:
         if condition(state):
             return True
     return False
 
 
+class BreadthFirstFrontier(object):
+    def __init__(self):
+        self._queue = deque()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def push(self, state: NarrativeState, depth: int):
+        self._queue.append((state, depth))
+
+    def pop(self) -> tuple:
+        return self._queue.popleft()
+
+    def entries(self) -> List[tuple]:
+        # pushing these again in this order rebuilds an equivalent frontier
+        return list(self._queue)
+
+
+class DepthFirstFrontier(object):
+    def __init__(self):
+        self._stack = []
+
+    def __len__(self):
+        return len(self._stack)
+
+    def push(self, state: NarrativeState, depth: int):
+        self._stack.append((state, depth))
+
+    def pop(self) -> tuple:
+        return self._stack.pop()
+
+    def entries(self) -> List[tuple]:
+        return list(self._stack)
+
+
+class PriorityFrontier(object):
+    # pops the entry with the lowest priority(state, depth) first, ties in insertion order
+    def __init__(self, priority: FunctionType):
+        self._priority = priority
+        self._heap = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, state: NarrativeState, depth: int):
+        heapq.heappush(self._heap, (self._priority(state.frozen(), depth), self._counter, state, depth))
+        self._counter += 1
+
+    def pop(self) -> tuple:
+        entry = heapq.heappop(self._heap)
+        return entry[2], entry[3]
+
+    def entries(self) -> List[tuple]:
+        return [(entry[2], entry[3]) for entry in sorted(self._heap, key=lambda entry: entry[:2])]
+
+
+class StoredFrontier(object):
+    # a breadth-first, or depth-first, frontier of the ids of states in a DiskStateStore, kept in a temporary table of
+    # the store's database instead of in memory
+    def __init__(self, store: 'DiskStateStore', depth_first: bool = False):
+        self._store = store
+        self._order = "DESC" if depth_first else "ASC"
+        self._table = "frontier_" + str(id(self))
+        self._count = 0
+        store.connection.execute("DROP TABLE IF EXISTS temp." + self._table)
+        store.connection.execute("CREATE TEMP TABLE " + self._table +
+                                 " (seq INTEGER PRIMARY KEY, state INTEGER NOT NULL, depth INTEGER NOT NULL)")
+
+    def __len__(self):
+        return self._count
+
+    def push(self, state: NarrativeState, depth: int):
+        self._store.connection.execute("INSERT INTO " + self._table + " (state, depth) VALUES (?, ?)",
+                                       (self._store.idOf(state), depth))
+        self._count += 1
+
+    def pop(self) -> tuple:
+        seq, state_id, depth = self._store.connection.execute(
+            "SELECT seq, state, depth FROM " + self._table + " ORDER BY seq " + self._order + " LIMIT 1").fetchone()
+        self._store.connection.execute("DELETE FROM " + self._table + " WHERE seq = ?", (seq,))
+        self._count -= 1
+        return self._store.stateOf(state_id), depth
+
+    def entries(self) -> List[tuple]:
+        return [(self._store.stateOf(state_id), depth) for state_id, depth in
+                self._store.connection.execute("SELECT state, depth FROM " + self._table + " ORDER BY seq")]
+
+
+class StateMarks(object):
+    # what an exploration knows of every state id: the shortest depth it was found at, whether it has been expanded and
+    # whether it ends the narrative, and the enabledness hint its parent left for it
+    def __init__(self):
+        self._depths: List[int] = []
+        self._expanded: List[bool] = []
+        self._terminal: List[bool] = []
+        self._hints: Dict[int, tuple] = dict()
+
+    def register(self, state_id: int, depth: int, terminal: bool, expanded: bool):
+        while len(self._depths) <= state_id:
+            self._depths.append(math.inf)
+            self._expanded.append(False)
+            self._terminal.append(False)
+        self._depths[state_id] = min(self._depths[state_id], depth)
+        self._terminal[state_id] = terminal
+        self._expanded[state_id] = expanded
+
+    def depthOf(self, state_id: int) -> int:
+        return self._depths[state_id]
+
+    def lowerDepth(self, state_id: int, depth: int) -> bool:
+        # True if depth is shorter than the one known so far, which it then replaces
+        if depth < self._depths[state_id]:
+            self._depths[state_id] = depth
+            return True
+        return False
+
+    def isExpanded(self, state_id: int) -> bool:
+        return self._expanded[state_id]
+
+    def setExpanded(self, state_id: int):
+        self._expanded[state_id] = True
+
+    def isTerminal(self, state_id: int) -> bool:
+        return self._terminal[state_id]
+
+    def putHint(self, state_id: int, hint: tuple):
+        self._hints[state_id] = hint
+
+    def popHint(self, state_id: int) -> tuple:
+        return self._hints.pop(state_id, None)
+
+    def unexpanded(self):
+        # (state id, depth) of every state neither expanded nor terminal
+        for state_id in range(len(self._depths)):
+            if not self._expanded[state_id] and not self._terminal[state_id]:
+                yield state_id, self._depths[state_id]
+
+    def checkpointData(self) -> dict:
+        return {"depths": list(self._depths), "expanded": list(self._expanded), "terminal": list(self._terminal)}
+
+    def restore(self, data: dict):
+        self._depths = list(data["depths"])
+        self._expanded = list(data["expanded"])
+        self._terminal = list(data["terminal"])
+
+
+class StoredStateMarks(StateMarks):
+    # the marks of an exploration into a DiskStateStore, kept in temporary tables of the store's database; a hint is
+    # saved once per parent, with the parent by id, and every child refers to it
+    def __init__(self, store: 'DiskStateStore'):
+        StateMarks.__init__(self)
+        self._store = store
+        suffix = "_" + str(id(self))
+        self._marksTable = "marks" + suffix
+        self._hintsTable = "hints" + suffix
+        self._parentHintsTable = "parent_hints" + suffix
+        self._lastParent = None
+        for table, columns in ((self._marksTable, "id INTEGER PRIMARY KEY, depth INTEGER, expanded INTEGER NOT NULL, "
+                                                  "terminal INTEGER NOT NULL"),
+                               (self._hintsTable, "id INTEGER PRIMARY KEY, parent INTEGER NOT NULL"),
+                               (self._parentHintsTable, "parent INTEGER PRIMARY KEY, hint BLOB NOT NULL")):
+            store.connection.execute("DROP TABLE IF EXISTS temp." + table)
+            store.connection.execute("CREATE TEMP TABLE " + table + " (" + columns + ")")
+
+    def _execute(self, statement: string, parameters: tuple = ()):
+        return self._store.connection.execute(statement, parameters)
+
+    def _markOf(self, state_id: int, column: string):
+        return self._execute("SELECT " + column + " FROM " + self._marksTable + " WHERE id = ?",
+                             (state_id,)).fetchone()[0]
+
+    def register(self, state_id: int, depth: int, terminal: bool, expanded: bool):
+        # an unknown depth is saved as NULL
+        known = self._execute("SELECT depth FROM " + self._marksTable + " WHERE id = ?", (state_id,)).fetchone()
+        if known is not None and known[0] is not None:
+            depth = min(depth, known[0])
+        self._execute("INSERT OR REPLACE INTO " + self._marksTable + " (id, depth, expanded, terminal) "
+                      "VALUES (?, ?, ?, ?)", (state_id, None if depth == math.inf else depth, int(expanded),
+                                              int(terminal)))
+
+    def depthOf(self, state_id: int) -> int:
+        depth = self._markOf(state_id, "depth")
+        return math.inf if depth is None else depth
+
+    def lowerDepth(self, state_id: int, depth: int) -> bool:
+        if depth < self.depthOf(state_id):
+            self._execute("UPDATE " + self._marksTable + " SET depth = ? WHERE id = ?", (depth, state_id))
+            return True
+        return False
+
+    def isExpanded(self, state_id: int) -> bool:
+        return self._markOf(state_id, "expanded") == 1
+
+    def setExpanded(self, state_id: int):
+        self._execute("UPDATE " + self._marksTable + " SET expanded = 1 WHERE id = ?", (state_id,))
+
+    def isTerminal(self, state_id: int) -> bool:
+        return self._markOf(state_id, "terminal") == 1
+
+    def putHint(self, state_id: int, hint: tuple):
+        enabled, reads, parent = hint
+        parent_id = self._store.idOf(parent)
+        if parent_id != self._lastParent:
+            self._execute("INSERT OR IGNORE INTO " + self._parentHintsTable + " (parent, hint) VALUES (?, ?)",
+                          (parent_id, pickle.dumps((enabled, reads), pickle.HIGHEST_PROTOCOL)))
+            self._lastParent = parent_id
+        self._execute("INSERT OR REPLACE INTO " + self._hintsTable + " (id, parent) VALUES (?, ?)",
+                      (state_id, parent_id))
+
+    def popHint(self, state_id: int) -> tuple:
+        row = self._execute("SELECT parent FROM " + self._hintsTable + " WHERE id = ?", (state_id,)).fetchone()
+        if row is None:
+            return None
+        self._execute("DELETE FROM " + self._hintsTable + " WHERE id = ?", (state_id,))
+        enabled, reads = pickle.loads(self._execute("SELECT hint FROM " + self._parentHintsTable + " WHERE parent = ?",
+                                                    row).fetchone()[0])
+        return enabled, reads, self._store.stateOf(row[0])
+
+    def unexpanded(self):
+        # fetched in batches of ids, since the caller may read the store in between
+        first = 0
+        while True:
+            batch = self._execute("SELECT id, depth FROM " + self._marksTable + " WHERE expanded = 0 AND terminal = 0 "
+                                  "AND id >= ? ORDER BY id LIMIT 1024", (first,)).fetchall()
+            if len(batch) == 0:
+                return
+            for state_id, depth in batch:
+                yield state_id, math.inf if depth is None else depth
+            first = batch[-1][0] + 1
+
+    def checkpointData(self) -> dict:
+        depths = []
+        expanded = []
+        terminal = []
+        for depth, is_expanded, is_terminal in self._execute("SELECT depth, expanded, terminal FROM " +
+                                                             self._marksTable + " ORDER BY id"):
+            depths.append(math.inf if depth is None else depth)
+            expanded.append(is_expanded == 1)
+            terminal.append(is_terminal == 1)
+        return {"depths": depths, "expanded": expanded, "terminal": terminal}
+
+    def restore(self, data: dict):
+        for state_id, (depth, expanded, terminal) in enumerate(zip(data["depths"], data["expanded"],
+                                                                   data["terminal"])):
+            self.register(state_id, depth, terminal, expanded)
+
+
+def currentMemory() -> int:
+    # resident set size of this process in bytes, or None where it cannot be read
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # peak rather than current size, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class GenerationBudget(object):
+    # limits for one generation run; None means unlimited. memory is the resident set size ceiling in bytes
+    MEMORY_CHECK_INTERVAL = 256
+
+    def __init__(self, seconds: float = None, states: int = None, edges: int = None, memory: int = None):
+        self._seconds = seconds
+        self._states = states
+        self._edges = edges
+        self._memory = memory
+        self._started = None
+        self._checks = 0
+        self._peakMemory = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._checks = 0
+
+    def exceeded(self, state_count: int, edge_count: int) -> string:
+        # the name of the first budget that ran out, or None
+        if self._states is not None and state_count >= self._states:
+            return "states"
+        if self._edges is not None and edge_count >= self._edges:
+            return "edges"
+        if self._seconds is not None and self.elapsed >= self._seconds:
+            return "time"
+        if self._memory is not None:
+            self._checks += 1
+            if self._checks % GenerationBudget.MEMORY_CHECK_INTERVAL == 1:
+                memory = currentMemory()
+                if memory is not None:
+                    self._peakMemory = memory if self._peakMemory is None else max(self._peakMemory, memory)
+                    if memory >= self._memory:
+                        return "memory"
+        return None
+
+    @property
+    def elapsed(self) -> float:
+        return 0.0 if self._started is None else time.perf_counter() - self._started
+
+    @property
+    def peakMemory(self) -> int:
+        return self._peakMemory
+
+
+class GenerationReport(object):
+    def __init__(self, reason: string, seconds: float, state_count: int, edge_count: int,
+                 frontier: Set[NarrativeState], memory: int = None):
+        self._reason = reason
+        self._seconds = seconds
+        self._stateCount = state_count
+        self._edgeCount = edge_count
+        self._frontier = frontier
+        self._memory = memory
+
+    def __str__(self):
+        s: string = "COMPLETE" if self.complete else "STOPPED BY " + self._reason.upper() + " BUDGET"
+        s = s + "\n    |---- seconds = " + "%.3f" % self._seconds
+        s = s + "\n    |---- states = " + str(self._stateCount)
+        s = s + "\n    |---- edges = " + str(self._edgeCount)
+        s = s + "\n    |---- unexpanded frontier = " + str(len(self._frontier))
+        if self._memory is not None:
+            s = s + "\n    |---- memory = " + str(self._memory)
+        return s
+
+    def __repr__(self):
+        return str(self)
+
+    @property
+    def complete(self) -> bool:
+        return self._reason is None
+
+    @property
+    def reason(self) -> string:
+        return self._reason
+
+    @property
+    def seconds(self) -> float:
+        return self._seconds
+
+    @property
+    def stateCount(self) -> int:
+        return self._stateCount
+
+    @property
+    def edgeCount(self) -> int:
+        return self._edgeCount
+
+    @property
+    def frontier(self) -> Set[NarrativeState]:
+        return self._frontier
+
+    @property
+    def memory(self) -> int:
+        return self._memory
+
+
+def accessOverlaps(accessed: Set[tuple], other: Set[tuple]) -> bool:
+    # None stands for an unknown set, which may touch every property
+    if accessed is None:
+        return other is None or len(other) > 0
+    if other is None:
+        return len(accessed) > 0
+    return not accessed.isdisjoint(other)
+
+
+def accessUnion(accessed: Set[tuple], other: Set[tuple]) -> Set[tuple]:
+    if accessed is None or other is None:
+        return None
+    return accessed | other
+
+
+def accessCovers(declared: Set[tuple], observed: Set[tuple]) -> bool:
+    return declared is None or observed <= declared
+
+
+class StubbornSets(object):
+    # partial-order reduction: from every state only a stubborn subset of the enabled choices is followed. Termination
+    # is treated as part of every guard, so a choice that can end the narrative depends on all others; the reduced
+    # graph keeps every termination state and dead end. Choices writing a visible property are only followed together
+    # with all the other enabled choices, which also keeps every combination of visible values reachable
+    def __init__(self, choices: ChoiceTable, termination_reads: Set[tuple], visible: Set[tuple] = None):
+        self._choices = choices
+        self._terminationReads = termination_reads
+        visible = frozenset(visible) if visible is not None else frozenset()
+        # termination states and dead ends are the deadlocks of the reduced system and survive any stubborn choice;
+        # visible values can only be postponed around a cycle, so the cycle proviso is only needed for them
+        self._proviso = len(visible) > 0
+        self._reads = [ch.readSet for ch in choices]
+        self._guardReads = [ch.guardReadSet for ch in choices]
+        self._writes = [ch.writeSet for ch in choices]
+
+        count = len(choices)
+        self._dependent: List[int] = [1 << i for i in range(count)]
+        self._enablers: List[int] = [0] * count
+        self._visibleChoices = 0
+        for i in range(count):
+            if accessOverlaps(self._writes[i], visible):
+                self._visibleChoices |= 1 << i
+            touched_i = accessUnion(accessUnion(self._reads[i], termination_reads), self._writes[i])
+            # states are only expanded while the termination conditions are false, so a disabled choice can only be
+            # enabled through the properties its own guard reads
+            guard_i = self._guardReads[i]
+            for j in range(count):
+                touched_j = accessUnion(accessUnion(self._reads[j], termination_reads), self._writes[j])
+                if accessOverlaps(self._writes[i], touched_j) or accessOverlaps(self._writes[j], touched_i):
+                    self._dependent[i] |= 1 << j
+                if accessOverlaps(self._writes[j], guard_i):
+                    self._enablers[i] |= 1 << j
+        self._ample: Dict[int, int] = dict()
+
+    def ample(self, enabled: int) -> int:
+        # the smallest enabled part of a stubborn set closed under dependency (enabled members) and under necessary
+        # enabling (disabled members), trying every enabled choice as the seed
+        if enabled in self._ample:
+            return self._ample[enabled]
+        best = enabled
+        for seed in range(len(self._choices)):
+            if not enabled & (1 << seed):
+                continue
+            stubborn = 1 << seed
+            pending = [seed]
+            while len(pending) > 0:
+                j = pending.pop()
+                added = (self._dependent[j] if enabled & (1 << j) else self._enablers[j]) & ~stubborn
+                stubborn |= added
+                pending.extend(k for k in range(len(self._choices)) if added & (1 << k))
+                if bin(stubborn & enabled).count("1") >= bin(best).count("1"):
+                    break
+            candidate = stubborn & enabled
+            if bin(candidate).count("1") < bin(best).count("1") and not candidate & self._visibleChoices:
+                best = candidate
+        self._ample[enabled] = best
+        return best
+
+    def coversChoice(self, choice_id: int, guard_reads: Set[tuple], action_reads: Set[tuple],
+                     writes: Set[tuple]) -> bool:
+        return accessCovers(self._guardReads[choice_id], guard_reads) and \
+               accessCovers(self._reads[choice_id], guard_reads | action_reads) and \
+               accessCovers(self._writes[choice_id], writes)
+
+    def coversGuard(self, choice_id: int, reads: Set[tuple]) -> bool:
+        return accessCovers(self._guardReads[choice_id], reads)
+
+    def coversTermination(self, reads: Set[tuple]) -> bool:
+        return accessCovers(self._terminationReads, reads)
+
+    @property
+    def proviso(self) -> bool:
+        return self._proviso
+
+
+class NarrativeExplorer(object):
+    # worklist exploration: no recursion, pluggable frontier, and every state is expanded according to the
+    # shortest depth it is reachable at, so max_depth cuts the model the same way whatever the exploration order.
+    # Given a DiskStateStore and no graph, the events are written to the store instead of a graph and an EventSet;
+    # without keep_events they are not kept anywhere and only reach the listener, called as listener(kind, item)
+    def __init__(self,
+                 choices: Set[NarrativeChoice],
+                 term_conditions: Set[FunctionType],
+                 max_depth: int = math.inf,
+                 frontier=None,
+                 store: StateStore = None,
+                 graph: nx.DiGraph = None,
+                 event_set: EventSet = None,
+                 incremental: bool = True,
+                 reduction: StubbornSets = None,
+                 keep_events: bool = True,
+                 listener: FunctionType = None):
+        self._choices: ChoiceTable = choiceTableOf(choices)
+        self._terminationConditions = term_conditions
+        self._maxDepth = max_depth
+        self._store: StateStore = store if store is not None else StateStore()
+        # on a DiskStateStore the frontier and the marks of the states are kept in its database as well
+        if frontier is None:
+            frontier = StoredFrontier(self._store) if isinstance(self._store, DiskStateStore) \
+                else BreadthFirstFrontier()
+        self._frontier = frontier
+        self._onDisk = isinstance(self._store, DiskStateStore) and graph is None and keep_events
+        self._keepEvents = keep_events
+        self._listener: FunctionType = listener
+        if self._onDisk:
+            self._store.bindChoices(self._choices)
+            self._graph: nx.DiGraph = nx.DiGraph()
+            self._eventSet = StoredEventSet(self._store)
+        else:
+            self._graph: nx.DiGraph = graph if graph is not None else nx.DiGraph()
+            self._eventSet: EventSet = event_set if event_set is not None else EventSet()
+        self._marks: StateMarks = StoredStateMarks(self._store) if isinstance(self._store, DiskStateStore) \
+            else StateMarks()
+        # incremental enabledness: a discovered child keeps its parent's enabled bitmap, the properties every
+        # precondition read on the parent and the parent itself until it is expanded; a precondition that read none of
+        # the properties the action changed must give the same answer again and is not called. This holds for
+        # deterministic preconditions that see the state only through the state they are handed (or copies of it);
+        # one that also depends on anything else, such as globals or a state captured elsewhere, needs incremental off
+        self._incremental = incremental
+        self._preconditionCalls = 0
+        # partial-order reduction trusts the access sets of the choices; every access made in a visited state, by the
+        # preconditions of all choices and the actions of the enabled ones, is checked against them and the first one
+        # outside stops the reduction, after which the graph built so far cannot be relied on. Accesses only made in
+        # states the reduced run never visits go unnoticed, so access sets set by hand remain a risk
+        self._reduction: StubbornSets = reduction
+        self._reductionViolated = False
+        self._edgeCount = self._graph.number_of_edges()
+        self._stopReason: string = None
+        self._roots: List[int] = []
+
+        # states already in the graph were explored by an earlier run and are not expanded again
+        for node in list(self._graph.nodes):
+            self._register(node, math.inf, checkForTermination(node, self._terminationConditions), True)
+
+    def _register(self, state: NarrativeState, depth: int, terminal: bool, expanded: bool) -> FrozenNarrativeState:
+        state = self._store.intern(state)
+        self._marks.register(self._store.idOf(state), depth, terminal, expanded)
+        return state
+
+    def addRoot(self, state: NarrativeState, depth: int = 1) -> FrozenNarrativeState:
+        # roots are expanded regardless of max_depth and of the termination conditions
+        if state.schema.symmetric:
+            state = state.representative()
+        state = self._register(state, depth, False, False)
+        if not self._onDisk and self._keepEvents and not self._graph.has_node(state):
+            self._graph.add_node(state)
+        self._roots.append(self._store.idOf(state))
+        self._frontier.push(state, depth)
+        if self._listener is not None:
+            self._listener(STATE_DISCOVERED, state)
+        return state
+
+    def run(self, budget: GenerationBudget = None, checkpoint: string = None, checkpoint_interval: float = 60.0):
+        # with a budget, stops before the first expansion that would start after a limit was reached; with a checkpoint
+        # path, the exploration is saved there every checkpoint_interval seconds and once more when the run stops
+        self._stopReason = None
+        if checkpoint is not None:
+            # fail before exploring rather than at the first save
+            self._choices.labels
+        if budget is not None:
+            budget.start()
+        last_checkpoint = time.perf_counter()
+        while len(self._frontier) > 0:
+            if budget is not None:
+                self._stopReason = budget.exceeded(len(self._store), self._edgeCount)
+                if self._stopReason is not None:
+                    break
+            if not self.step():
+                break
+            if checkpoint is not None and time.perf_counter() - last_checkpoint >= checkpoint_interval:
+                self.saveCheckpoint(checkpoint)
+                last_checkpoint = time.perf_counter()
+        if checkpoint is not None:
+            self.saveCheckpoint(checkpoint)
+
+    def step(self) -> bool:
+        # expands, or passes a shorter depth on from, the next state of the frontier; False once it is empty
+        while len(self._frontier) > 0:
+            state, depth = self._frontier.pop()
+            state_id = self._store.idOf(state)
+            if depth > self._marks.depthOf(state_id):
+                continue
+            if self._marks.isExpanded(state_id):
+                self._relax(state, depth)
+            else:
+                self._expand(state, state_id, depth)
+            return True
+        return False
+
+    def _shouldExpand(self, state_id: int, depth: int) -> bool:
+        return not self._marks.isTerminal(state_id) and depth <= self._maxDepth
+
+    def _enabledChoices(self, state: FrozenNarrativeState, state_id: int) -> tuple:
+        if not self._incremental and self._reduction is None:
+            self._preconditionCalls += len(self._choices)
+            return self._choices.enabledMask(state), None, None
+
+        hint = self._marks.popHint(state_id)
+        changed = None
+        if hint is not None:
+            parent_enabled, parent_reads, parent = hint
+            changed = state.schema.difference(parent._values, state._values)
+
+        enabled = 0
+        reads = []
+        guardIndex = self._choices.guardIndex
+        candidates = None
+        for i in range(len(self._choices)):
+            if changed is not None and parent_reads[i].isdisjoint(changed):
+                enabled |= parent_enabled & (1 << i)
+                reads.append(parent_reads[i])
+                continue
+            guard = guardIndex.guardOf(i)
+            if guard is not None:
+                # a guard that fails its equality tests depends on nothing but the properties it tests
+                if candidates is None:
+                    candidates = guardIndex.candidates(state)
+                if i not in candidates:
+                    reads.append(guard.keys)
+                    continue
+                proxy = RecordingNarrativeState(state, True)
+                self._preconditionCalls += 1
+                if guard.testPredicate(proxy):
+                    enabled |= 1 << i
+                reads.append(guard.keys | proxy.reads)
+                continue
+            proxy = RecordingNarrativeState(state, True)
+            self._preconditionCalls += 1
+            if self._choices[i]._pre_condition(proxy):
+                enabled |= 1 << i
+            reads.append(frozenset(proxy.reads))
+
+        # the stubborn sets rely on the guard reads of disabled choices too: they decide what can enable them
+        if self._reduction is not None:
+            for i in range(len(self._choices)):
+                if not self._reduction.coversGuard(i, reads[i]):
+                    self._reductionViolated = True
+                    break
+
+        hint = (enabled, reads, state)
+        return enabled, reads, hint if self._incremental else None
+
+    def _expand(self, state: FrozenNarrativeState, state_id: int, depth: int):
+        self._marks.setExpanded(state_id)
+        discovered = []
+        enabled, reads, hint = self._enabledChoices(state, state_id)
+        followed = enabled
+        if self._reduction is not None and not self._reductionViolated:
+            followed = self._reduction.ample(enabled)
+        if enabled == 0 and self._listener is not None:
+            self._listener(DEAD_END_REACHED, state)
+
+        all_new = True
+        for choice_id in self._choices.idsOf(followed):
+            all_new = self._follow(state, choice_id, reads, depth, hint, discovered) and all_new
+
+        # cycle proviso: a reduced expansion that leads back into known states could postpone the other choices
+        # forever, so such a state is expanded in full
+        if followed != enabled and ((not all_new and self._reduction.proviso) or self._reductionViolated):
+            for choice_id in self._choices.idsOf(enabled & ~followed):
+                self._follow(state, choice_id, reads, depth, hint, discovered)
+        elif followed != enabled:
+            # the pruned choices are still run on a recording state, since their writes decide which choices they
+            # depend on; the resulting states are dropped
+            for choice_id in self._choices.idsOf(enabled & ~followed):
+                self._recordedAction(state, choice_id, reads)
+
+        self._push(discovered, depth + 1)
+
+    def _follow(self, state: FrozenNarrativeState, choice_id: int, reads: List[Set[tuple]], depth: int, hint: tuple,
+                discovered: List[FrozenNarrativeState]) -> bool:
+        ch = self._choices[choice_id]
+        if self._reduction is None:
+            child = ch.Action(state)
+        else:
+            child = self._recordedAction(state, choice_id, reads)
+        if child.schema.symmetric:
+            child = child.representative()
+
+        canonical_child = self._store.canonical(child)
+        is_new = canonical_child is None
+        if is_new:
+            terminal = self._checkTermination(child)
+            child = self._register(child, depth + 1, terminal, False)
+            if not self._onDisk and self._keepEvents:
+                self._graph.add_node(child)
+            discovered.append(child)
+            if hint is not None and not terminal:
+                self._marks.putHint(self._store.idOf(child), hint)
+            if self._listener is not None:
+                self._listener(STATE_DISCOVERED, child)
+                if terminal:
+                    self._listener(TERMINATION_REACHED, child)
+        else:
+            child = canonical_child
+            if self._marks.lowerDepth(self._store.idOf(child), depth + 1):
+                discovered.append(child)
+
+        if self._listener is not None:
+            self._listener(EVENT_DISCOVERED, NarrativeEvent(state, child, ch))
+        if self._onDisk:
+            if self._store.addEdge(self._store.idOf(state), self._store.idOf(child), choice_id):
+                self._edgeCount += 1
+            return is_new
+        if not self._keepEvents:
+            self._edgeCount += 1
+            return is_new
+
+        if self._graph.has_edge(state, child):
+            self._graph[state][child]["choices"].add(ch)
+        else:
+            self._graph.add_edge(state, child, choices={ch})
+            self._edgeCount += 1
+
+        self._eventSet.add(NarrativeEvent(state, child, ch))
+        return is_new
+
+    def _recordedAction(self, state: FrozenNarrativeState, choice_id: int, reads: List[Set[tuple]]) -> NarrativeState:
+        proxy = RecordingNarrativeState(state)
+        child = self._choices[choice_id]._action(proxy)
+        child = child.snapshot() if isinstance(child, RecordingNarrativeState) else child.frozen()
+        if not self._reduction.coversChoice(choice_id, reads[choice_id], proxy.reads, proxy.writes):
+            self._reductionViolated = True
+        return child
+
+    def _checkTermination(self, state: NarrativeState) -> bool:
+        if self._reduction is None:
+            return checkForTermination(state, self._terminationConditions)
+        proxy = RecordingNarrativeState(state, True)
+        terminal = False
+        for condition in self._terminationConditions:
+            if condition(proxy):
+                terminal = True
+                break
+        if not self._reduction.coversTermination(proxy.reads):
+            self._reductionViolated = True
+        return terminal
+
+    def _relax(self, state: FrozenNarrativeState, depth: int):
+        # a shorter route to an already expanded state: pass the improvement on along the edges found before
+        improved = []
+        if self._onDisk:
+            children = [self._store.stateOf(child_id) for child_id in self._store.successors(self._store.idOf(state))]
+        elif self._keepEvents:
+            children = self._graph.successors(state)
+        else:
+            # no edges were kept, so the successors are computed again
+            self._preconditionCalls += len(self._choices)
+            children = [self._choices[choice_id].Action(state).representative()
+                        for choice_id in self._choices.idsOf(self._choices.enabledMask(state))]
+        for child in children:
+            if self._marks.lowerDepth(self._store.idOf(child), depth + 1):
+                improved.append(child)
+        self._push(improved, depth + 1)
+
+    def _push(self, states: List[FrozenNarrativeState], depth: int):
+        # reversed so that a depth-first frontier explores the choices in their original order
+        for child in reversed(states):
+            child_id = self._store.idOf(child)
+            if self._marks.isExpanded(child_id) or self._shouldExpand(child_id, depth):
+                self._frontier.push(child, depth)
+
+    def depthOf(self, state: NarrativeState) -> int:
+        return self._marks.depthOf(self._store.idOf(state))
+
+    def isTerminal(self, state: NarrativeState) -> bool:
+        return self._marks.isTerminal(self._store.idOf(state))
+
+    @property
+    def preconditionCalls(self) -> int:
+        return self._preconditionCalls
+
+    @property
+    def reductionViolated(self) -> bool:
+        return self._reductionViolated
+
+    @property
+    def stopReason(self) -> string:
+        return self._stopReason
+
+    @property
+    def roots(self) -> List[FrozenNarrativeState]:
+        return [self._store.stateOf(state_id) for state_id in self._roots]
+
+    def checkpointData(self) -> dict:
+        # states are saved as plain rows and choices by id: schemas and functions are rebuilt from the setting on resume
+        schemas = []
+        state_schemas = []
+        rows = []
+        for state in self._store:
+            if state.schema.labels not in schemas:
+                schemas.append(state.schema.labels)
+            state_schemas.append(schemas.index(state.schema.labels))
+            rows.append(state.rows)
+        edges = []
+        if self._onDisk:
+            edges = list(self._store.edges())
+        for u, v, data in self._graph.edges(data=True):
+            for ch in data["choices"]:
+                edges.append((self._store.idOf(u), self._store.idOf(v), self._choices.idOf(ch)))
+        data = {
+            "version": 1,
+            "choices": self._choices.labels,
+            "maxDepth": self._maxDepth,
+            "frontier": type(self._frontier).__name__,
+            "entries": [(self._store.idOf(state), depth) for state, depth in self._frontier.entries()],
+            "schemas": schemas,
+            "stateSchemas": state_schemas,
+            "rows": rows,
+            "edges": edges,
+            "roots": list(self._roots),
+            "preconditionCalls": self._preconditionCalls,
+            "reductionViolated": self._reductionViolated,
+        }
+        data.update(self._marks.checkpointData())
+        return data
+
+    def saveCheckpoint(self, checkpoint: string):
+        # written next to the target and moved over it, so an interruption never leaves a truncated checkpoint behind
+        temporary = checkpoint + ".tmp"
+        with open(temporary, 'wb') as checkpoint_file:
+            checkpoint_file.write(zlib.compress(pickle.dumps(self.checkpointData(), pickle.HIGHEST_PROTOCOL)))
+        os.replace(temporary, checkpoint)
+
+    def restoreCheckpoint(self, data: dict, schemas: Dict[tuple, StateSchema]):
+        if len(self._store) > 0:
+            raise Exception("Cannot restore a checkpoint into an explorer that has already started")
+        if data["choices"] != self._choices.labels:
+            raise Exception("Cannot resume: the choices of the setting differ from the ones in the checkpoint")
+        for schema_index, rows in zip(data["stateSchemas"], data["rows"]):
+            labels = data["schemas"][schema_index]
+            if labels not in schemas:
+                raise Exception("Cannot find the context of the checkpointed states among the initial states")
+            state = object.__new__(FrozenNarrativeState)
+            state._schema = schemas[labels]
+            state._values = state._schema.encode(rows)
+            state._hash = None
+            state = self._store.intern(state)
+            if not self._onDisk:
+                self._graph.add_node(state)
+        self._marks.restore(data)
+        for parent_id, child_id, choice_id in data["edges"]:
+            if self._onDisk:
+                if self._store.addEdge(parent_id, child_id, choice_id):
+                    self._edgeCount += 1
+                continue
+            parent = self._store.stateOf(parent_id)
+            child = self._store.stateOf(child_id)
+            ch = self._choices[choice_id]
+            if self._graph.has_edge(parent, child):
+                self._graph[parent][child]["choices"].add(ch)
+            else:
+                self._graph.add_edge(parent, child, choices={ch})
+                self._edgeCount += 1
+            self._eventSet.add(NarrativeEvent(parent, child, ch))
+        for state_id, depth in data["entries"]:
+            self._frontier.push(self._store.stateOf(state_id), depth)
+        self._roots = list(data["roots"])
+        self._preconditionCalls = data["preconditionCalls"]
+        self._reductionViolated = data["reductionViolated"]
+
+    def cutOffStates(self):
+        # states never expanded although no termination condition holds on them: beyond max_depth, or left in the
+        # frontier of a stopped run. Yielded one at a time, since the store may be on disk
+        for state_id, _ in self._marks.unexpanded():
+            yield self._store.stateOf(state_id)
+
+    def unexpandedStates(self) -> Set[FrozenNarrativeState]:
+        # states that would still be expanded if the run went on
+        return set(self._store.stateOf(state_id) for state_id, depth in self._marks.unexpanded()
+                   if depth <= self._maxDepth)
+
+    @property
+    def edgeCount(self) -> int:
+        return self._edgeCount
+
+    @property
+    def store(self) -> StateStore:
+        return self._store
+
+    @property
+    def choices(self) -> ChoiceTable:
+        return self._choices
+
+    @property
+    def graph(self) -> nx.DiGraph:
+        return self._graph
+
+    @property
+    def eventSet(self) -> EventSet:
+        return self._eventSet
+
+
 def simulateFrom(root_world_state: NarrativeState,
                  choices: Set[NarrativeChoice],
                  term_conditions: Set[FunctionType],
                  eventSet: EventSet,
                  graph: nx.DiGraph,
                  current_depth: int,
-                 max_depth: int):
-    possibleChoices = getPossibleChoices(root_world_state, choices)
-    if len(possibleChoices) > 0:
-        for ch in possibleChoices.values():
-            child_world_state = ch.Action(deepcopy(root_world_state))
-
-            if not graph.has_node(child_world_state):
-                graph.add_node(child_world_state)
-                if not checkForTermination(child_world_state, term_conditions) and current_depth < max_depth:
-                    simulateFrom(child_world_state,
-                                 choices,
-                                 term_conditions,
-                                 eventSet,
-                                 graph,
-                                 current_depth + 1,
-                                 max_depth)
-
-            if not graph.has_edge(root_world_state, child_world_state):
-                graph.add_edge(root_world_state, child_world_state)
-
-            try:
-                graph[root_world_state][child_world_state]["choices"].add(ch)
-            except:
-                graph[root_world_state][child_world_state]["choices"]: Set = {ch}
-
-            eventSet.add(NarrativeEvent(root_world_state, child_world_state, ch))
+                 max_depth: int,
+                 store: StateStore = None):
+    explorer = NarrativeExplorer(choices, term_conditions, max_depth, DepthFirstFrontier(), store, graph, eventSet)
+    explorer.addRoot(root_world_state, current_depth)
+    explorer.run()
 
 
 def generateNarrativeModel(setting: NarrationSetting, max_depth: int = math.inf,
-                           printProcess: bool = True) -> NarrativeModel:
+                           printProcess: bool = True, trusted: bool = False, frontier=None,
+                           incremental: bool = True, reduction: bool = False,
+                           visible: Set[tuple] = None, budget: GenerationBudget = None,
+                           checkpoint: string = None, checkpoint_interval: float = 60.0) -> NarrativeModel:
+    # reduction enables partial-order reduction; visible names the (entity, property) pairs the assertions look at,
+    # on top of the ones the termination conditions read. checkpoint is a file the exploration is saved to, which
+    # resumeNarrativeModel continues from
     if printProcess:
         print("=== MODEL GENERATION STARTED ===")
-    narrativeGraph: nx.DiGraph = nx.DiGraph()
-
-    def passesAnyTerminationConditions(state) -> bool:
-        for cond in setting.terminationConditions:
-            if cond(state):
-                return True
-        return False
-
-    valid_roots = [root for root in setting.initialStates if not passesAnyTerminationConditions(root)]
-
-    for root in valid_roots:
-        root_state = deepcopy(root)
-        narrativeGraph.add_node(root_state)
-
-    eventSet: EventSet = EventSet()
 
+    choiceTable: ChoiceTable = choiceTableOf(setting.choices)
+    roots = [root.representative() for root in setting.initialStates]
+    valid_roots = [root for root in roots if not checkForTermination(root, setting.terminationConditions)]
+
+    explorer = NarrativeExplorer(choiceTable,
+                                 setting.terminationConditions,
+                                 max_depth,
+                                 frontier,
+                                 StateStore(),
+                                 nx.DiGraph(),
+                                 EventSet(),
+                                 incremental,
+                                 stubbornSetsFor(setting, choiceTable, valid_roots, visible) if reduction else None)
     for root in valid_roots:
-        root_state = deepcopy(root)
-        simulateFrom(root_state,
-                     setting.choices,
-                     setting.terminationConditions,
-                     eventSet,
-                     narrativeGraph,
-                     1,
-                     max_depth)
+        explorer.addRoot(root)
+
+    model = runNarrativeExplorer(setting, explorer, printProcess, trusted, budget, checkpoint, checkpoint_interval)
+    if model is None:
+        # a choice touched properties outside its inferred access sets: the reduced graph may have missed states
+        if printProcess:
+            print("=== ACCESS SETS INCOMPLETE, GENERATING WITHOUT REDUCTION ===")
+        return generateNarrativeModel(setting, max_depth, printProcess, trusted, None, incremental,
+                                      budget=budget, checkpoint=checkpoint, checkpoint_interval=checkpoint_interval)
+    return model
+
+
+def resumeNarrativeModel(checkpoint: string, setting: NarrationSetting,
+                         printProcess: bool = True, trusted: bool = False, frontier=None,
+                         incremental: bool = True, reduction: bool = False,
+                         visible: Set[tuple] = None, budget: GenerationBudget = None,
+                         checkpoint_interval: float = 60.0) -> NarrativeModel:
+    # continues the generation saved in checkpoint; the setting must be the one it was started with, since choices and
+    # termination conditions are code and are not part of the checkpoint
+    if printProcess:
+        print("=== MODEL GENERATION RESUMED ===")
+    data = loadCheckpoint(checkpoint)
+
+    if frontier is None:
+        if data["frontier"] == BreadthFirstFrontier.__name__:
+            frontier = BreadthFirstFrontier()
+        elif data["frontier"] == DepthFirstFrontier.__name__:
+            frontier = DepthFirstFrontier()
+        else:
+            raise Exception("Cannot resume a <" + data["frontier"] + "> without passing the frontier")
+
+    choiceTable: ChoiceTable = choiceTableOf(setting.choices)
+    roots = [root.representative() for root in setting.initialStates]
+    schemas = {root.schema.labels: root.schema for root in roots}
+
+    explorer = NarrativeExplorer(choiceTable,
+                                 setting.terminationConditions,
+                                 data["maxDepth"],
+                                 frontier,
+                                 StateStore(),
+                                 nx.DiGraph(),
+                                 EventSet(),
+                                 incremental,
+                                 stubbornSetsFor(setting, choiceTable, roots, visible) if reduction else None)
+    explorer.restoreCheckpoint(data, schemas)
+
+    model = runNarrativeExplorer(setting, explorer, printProcess, trusted, budget, checkpoint, checkpoint_interval)
+    if model is None:
+        if printProcess:
+            print("=== ACCESS SETS INCOMPLETE, GENERATING WITHOUT REDUCTION ===")
+        return generateNarrativeModel(setting, data["maxDepth"], printProcess, trusted, None, incremental,
+                                      budget=budget, checkpoint=checkpoint, checkpoint_interval=checkpoint_interval)
+    return model
+
+
+def loadCheckpoint(checkpoint: string) -> dict:
+    with open(checkpoint, 'rb') as checkpoint_file:
+        data = pickle.loads(zlib.decompress(checkpoint_file.read()))
+    if data.get("version") != 1:
+        raise Exception("Cannot read checkpoint <" + checkpoint + ">")
+    return data
+
+
+def stubbornSetsFor(setting: NarrationSetting, choiceTable: ChoiceTable, roots: List[NarrativeState],
+                    visible: Set[tuple]) -> StubbornSets:
+    if any(root.schema.symmetric for root in roots):
+        raise Exception("Cannot combine partial-order reduction with symmetric entities")
+    if setting.terminationReadSet is None or any(ch.readSet is None or ch.writeSet is None for ch in choiceTable):
+        inferAccessSets(setting)
+    return StubbornSets(choiceTable, setting.terminationReadSet, visible)
+
+
+def runNarrativeExplorer(setting: NarrationSetting, explorer: NarrativeExplorer, printProcess: bool, trusted: bool,
+                         budget: GenerationBudget, checkpoint: string, checkpoint_interval: float) -> NarrativeModel:
+    # runs a prepared explorer and wraps what it found into a model; None if the partial-order reduction was unsound
+    roots = explorer.roots
+    exploreTrusted(explorer, trusted, budget, checkpoint, checkpoint_interval)
+
+    if explorer.reductionViolated:
+        return None
+
+    stateStore = explorer.store
+    narrativeGraph = explorer.graph
+    frontierStates: Set[NarrativeState] = set()
+    report = None
+    if budget is not None:
+        if explorer.stopReason is not None:
+            frontierStates = explorer.unexpandedStates()
+        report = GenerationReport(explorer.stopReason, budget.elapsed, len(stateStore), explorer.edgeCount,
+                                  frontierStates, budget.peakMemory)
+        if printProcess:
+            print(report)
 
     terminationStates: Set[NarrativeState] = set()
     for node in narrativeGraph.nodes:
@@ -791,12 +3489,1006 @@ def generateNarrativeModel(setting: NarrationSetting, max_depth: int = math.inf,
     if printProcess:
         print("=== MODEL GENERATION ENDED ===")
 
-    return NarrativeModel(deepcopy(set(valid_roots)),
+    return NarrativeModel(set(roots),
+                          terminationStates,
+                          deepcopy(setting.terminationConditions),
+                          deepcopy(setting.choices),
+                          explorer.eventSet,
+                          narrativeGraph,
+                          stateStore,
+                          explorer.choices,
+                          frontierStates,
+                          report)
+
+
+def exploreTrusted(explorer: NarrativeExplorer, trusted: bool, budget: GenerationBudget, checkpoint: string,
+                   checkpoint_interval: float):
+    trustedSchemas = []
+    if trusted:
+        for root in explorer.roots:
+            if not root.schema.trusted:
+                root.schema.setTrusted(True)
+                trustedSchemas.append(root.schema)
+
+    try:
+        explorer.run(budget, checkpoint, checkpoint_interval)
+    finally:
+        for schema in trustedSchemas:
+            schema.setTrusted(False)
+
+
+def generateNarrativeStore(setting: NarrationSetting, store: DiskStateStore = None, max_depth: int = math.inf,
+                           printProcess: bool = True, trusted: bool = False, frontier=None,
+                           incremental: bool = False, budget: GenerationBudget = None) -> DiskStateStore:
+    # generation for state spaces larger than memory: states and events are written to a DiskStateStore rather than
+    # kept in a model, and statesOf, eventsIn, contains and the filters read them back from it. The frontier and the
+    # per-state marks of the exploration are kept in the store's database too; incremental enabledness would add the
+    # precondition reads of every expanded state to it, so it is off by default here
+    if printProcess:
+        print("=== MODEL GENERATION STARTED ===")
+
+    store = store if store is not None else DiskStateStore()
+    if len(store) > 0:
+        raise Exception("Cannot generate into state store <" + store.path + ">, it already holds states")
+    roots = [root.representative() for root in setting.initialStates]
+    valid_roots = [root for root in roots if not checkForTermination(root, setting.terminationConditions)]
+
+    explorer = NarrativeExplorer(setting.choices, setting.terminationConditions, max_depth, frontier, store, None,
+                                 None, incremental)
+    for root in valid_roots:
+        explorer.addRoot(root)
+    exploreTrusted(explorer, trusted, budget, None, 0.0)
+    store.flush()
+
+    if budget is not None and printProcess:
+        print(GenerationReport(explorer.stopReason, budget.elapsed, len(store), explorer.edgeCount,
+                               explorer.unexpandedStates() if explorer.stopReason is not None else set(),
+                               budget.peakMemory))
+    if printProcess:
+        print("=== MODEL GENERATION ENDED ===")
+    return store
+
+
+def iterateNarrative(setting: NarrationSetting, max_depth: int = math.inf, frontier=None, incremental: bool = True,
+                     store: StateStore = None):
+    # streams (kind, item) pairs in discovery order instead of building a model: STATE_DISCOVERED and
+    # TERMINATION_REACHED with a state, EVENT_DISCOVERED with a NarrativeEvent and DEAD_END_REACHED with a state that
+    # has no successors and ends nothing. One state is expanded at a time, when the consumer asks for more than that
+    # expansion produced, and only the visited states are kept; on a DiskStateStore, the events are kept on disk too
+    choiceTable: ChoiceTable = choiceTableOf(setting.choices)
+    updates = deque()
+    explorer = NarrativeExplorer(choiceTable,
+                                 setting.terminationConditions,
+                                 max_depth,
+                                 frontier,
+                                 store,
+                                 None,
+                                 None,
+                                 incremental,
+                                 keep_events=isinstance(store, DiskStateStore),
+                                 listener=lambda kind, item: updates.append((kind, item)))
+    for root in setting.initialStates:
+        root = root.representative()
+        if not checkForTermination(root, setting.terminationConditions):
+            explorer.addRoot(root)
+
+    while True:
+        while len(updates) > 0:
+            yield updates.popleft()
+        if not explorer.step():
+            break
+    for state in explorer.cutOffStates():
+        yield DEAD_END_REACHED, state
+    if isinstance(store, DiskStateStore):
+        store.flush()
+
+
+def findWitness(setting: NarrationSetting, target: FunctionType, heuristic: FunctionType = None,
+                max_depth: int = math.inf, incremental: bool = True) -> NarrativePath:
+    # on-the-fly reachability: explores from the initial states only until a state satisfying target is discovered and
+    # returns the path to it, or None if no state of the model generateNarrativeModel would build satisfies it.
+    # Breadth-first by default, which finds a shortest witness; given a heuristic, an estimate of the choices still
+    # needed from a state, the state with the lowest depth plus estimate is expanded first, as in A*.
+    # with symmetric entities the explored states are representatives, so target and heuristic are evaluated on every
+    # permutation of them, and the path found is replayed to one that really ends in a state satisfying target
+    if heuristic is None:
+        frontier = BreadthFirstFrontier()
+    else:
+        frontier = PriorityFrontier(lambda state, depth: depth + min(heuristic(member) for member in state.orbit()))
+    parents: Dict[NarrativeState, tuple] = dict()
+    found = []
+
+    def listen(kind: string, item):
+        if kind == STATE_DISCOVERED:
+            if len(found) == 0 and any(target(member) for member in item.orbit()):
+                found.append(item)
+        elif kind == EVENT_DISCOVERED:
+            # the first event into a state is the one it was discovered by
+            parents.setdefault(item.PostState, (item.PreState, item.Choice))
+
+    explorer = NarrativeExplorer(setting.choices, setting.terminationConditions, max_depth, frontier, None, None, None,
+                                 incremental, keep_events=False, listener=listen)
+    for root in setting.initialStates:
+        root = root.representative()
+        if not checkForTermination(root, setting.terminationConditions):
+            parents[explorer.addRoot(root)] = None
+    while len(found) == 0 and explorer.step():
+        pass
+    if len(found) == 0:
+        return None
+
+    states = [found[0]]
+    choices = []
+    while parents[states[-1]] is not None:
+        parent, ch = parents[states[-1]]
+        states.append(parent)
+        choices.append(ch)
+    states.reverse()
+    choices.reverse()
+    if states[0].schema.symmetric:
+        return replayWitness(setting, target, states)
+    return NarrativePath(states, choices)
+
+
+def replayWitness(setting: NarrationSetting, target: FunctionType, representatives: List[NarrativeState]) \
+        -> NarrativePath:
+    # follows a path of representatives through the states they stand for: starting from every permutation of the
+    # root, each step keeps the children whose representative is the next one on the path. Since the choices treat
+    # the symmetric entities alike, the last step reaches every permutation of the last representative
+    layers: List[Dict[NarrativeState, tuple]] = [dict((root, None) for root in representatives[0].orbit())]
+    for representative in representatives[1:]:
+        layer = dict()
+        for state in layers[-1]:
+            for ch in setting.choices:
+                if ch.PreCondition(state):
+                    child = ch.Action(state).frozen()
+                    if child not in layer and child.representative() == representative:
+                        layer[child] = (state, ch)
+        layers.append(layer)
+
+    end = next((state for state in layers[-1] if target(state)), None)
+    if end is None:
+        raise Exception("Cannot replay the witness: the choices do not treat the symmetric entities alike")
+    states = [end]
+    choices = []
+    for layer in reversed(layers[1:]):
+        parent, ch = layer[states[-1]]
+        states.append(parent)
+        choices.append(ch)
+    states.reverse()
+    choices.reverse()
+    return NarrativePath(states, choices)
+
+
+def isReachable(setting: NarrationSetting, target: FunctionType, heuristic: FunctionType = None,
+                max_depth: int = math.inf) -> bool:
+    return findWitness(setting, target, heuristic, max_depth) is not None
+
+
+def propertyDistance(goal: Dict[tuple, object]) -> FunctionType:
+    # a heuristic for findWitness: how many of the goal's (entity, property) values a state does not hold yet, which
+    # never overestimates as long as no choice sets more than one of them
+    def distance(w: NarrativeState) -> int:
+        return sum(1 for (entity_name, property_name), value in goal.items()
+                   if w.getValue(entity_name, property_name) != value)
+
+    return distance
+
+
+# =================================================== Parallel Generation ==============================================
+
+
+def hashPartition(state: NarrativeState, partition_count: int) -> int:
+    # only valid when every process shares the string hash seed, i.e. when workers are forked
+    return hash(state) % partition_count
+
+
+def canonicalSchemaOf(state: NarrativeState, schemas: Dict[StateSchema, StateSchema]) -> NarrativeState:
+    # every unpickled batch brings its own copy of the schema; fold equal ones back into a single object
+    state._schema = schemas.setdefault(state.schema, state.schema)
+    return state
+
+
+def runGenerationPartition(partition: int,
+                           connection,
+                           inboxes: list,
+                           choices: ChoiceTable,
+                           term_conditions: Set[FunctionType],
+                           max_depth: int,
+                           roots: List[NarrativeState]):
+    # a worker owns the states hashPartition maps to it: it deduplicates them, checks them for termination, expands
+    # them and puts every successor, with the (partition, id, choice) of the parents it came from, straight into the
+    # inbox of the successor's owner. The owner records the edge, so every edge ends up as a pair of store ids. The
+    # coordinator only tells the workers how many batches to wait for in each round
+    partition_count = len(inboxes)
+    store = StateStore()
+    schemas = dict()
+    terminal: List[bool] = []
+    edges: List[tuple] = []
+    early: Dict[int, list] = dict()
+    local = [(root, []) for root in roots if hashPartition(root, partition_count) == partition]
+    try:
+        while True:
+            message = connection.recv()
+            if message[0] == "finish":
+                connection.send(("finish", list(store), terminal, edges))
+                return
+
+            depth, expected = message[1], message[2]
+            batches = [local] + early.pop(depth, [])
+            while len(batches) < expected + 1:
+                batch_depth, batch = inboxes[partition].get()
+                batch = [(canonicalSchemaOf(state, schemas), parents) for state, parents in batch]
+                if batch_depth != depth:
+                    # a faster worker is already a round ahead
+                    early.setdefault(batch_depth, []).append(batch)
+                    continue
+                batches.append(batch)
+
+            outgoing = [dict() for _ in range(partition_count)]
+            for batch in batches:
+                for state, parents in batch:
+                    if state in store:
+                        state_id = store.idOf(state)
+                        is_new = False
+                    else:
+                        state = store.intern(state)
+                        state_id = len(store) - 1
+                        is_new = True
+                    for parent_partition, parent_id, index in parents:
+                        edges.append((parent_partition, parent_id, state_id, index))
+                    if not is_new:
+                        continue
+
+                    is_root = depth == 1
+                    is_terminal = not is_root and checkForTermination(state, term_conditions)
+                    terminal.append(is_terminal)
+                    if is_terminal or (not is_root and depth > max_depth):
+                        continue
+                    for index in range(len(choices)):
+                        if choices[index].PreCondition(state):
+                            child = choices[index].Action(state).representative()
+                            owner = outgoing[hashPartition(child, partition_count)]
+                            owner.setdefault(child, []).append((partition, state_id, index))
+
+            local = list(outgoing[partition].items())
+            sent = [False for _ in range(partition_count)]
+            for owner in range(partition_count):
+                if owner != partition and len(outgoing[owner]) > 0:
+                    inboxes[owner].put((depth + 1, list(outgoing[owner].items())))
+                    sent[owner] = True
+            connection.send(("round", sent, len(local) > 0))
+    except BaseException:
+        connection.send(("error", traceback.format_exc()))
+
+
+def receiveFromPartition(connection) -> tuple:
+    reply = connection.recv()
+    if reply[0] == "error":
+        raise Exception("Parallel generation worker failed:\n" + reply[1])
+    return reply
+
+
+def generateNarrativeModelInParallel(setting: NarrationSetting, processes: int = None, max_depth: int = math.inf,
+                                     printProcess: bool = True) -> NarrativeModel:
+    # breadth-first rounds: in round d every worker expands the newly discovered states of depth d that it owns,
+    # so max_depth and the resulting model match generateNarrativeModel.
+    # workers are forked so that they inherit the setting (lambdas in choices and conditions cannot be pickled) and
+    # share the hash seed hashPartition relies on; without fork, or with a single process, the model is generated
+    # serially instead
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return generateNarrativeModel(setting, max_depth, printProcess)
+
+    if printProcess:
+        print("=== PARALLEL MODEL GENERATION STARTED ===")
+    mp_context = multiprocessing.get_context("fork")
+
+    choices: ChoiceTable = choiceTableOf(setting.choices)
+    roots = [root.representative().frozen() for root in setting.initialStates]
+    valid_roots = [root for root in roots if not checkForTermination(root, setting.terminationConditions)]
+    schemas = {root.schema: root.schema for root in valid_roots}
+
+    connections = []
+    workers = []
+    inboxes = [mp_context.Queue() for _ in range(processes)]
+    for partition in range(processes):
+        parent_end, child_end = mp_context.Pipe()
+        worker = mp_context.Process(target=runGenerationPartition,
+                                    args=(partition, child_end, inboxes, choices, setting.terminationConditions,
+                                          max_depth, valid_roots),
+                                    daemon=True)
+        worker.start()
+        child_end.close()
+        connections.append(parent_end)
+        workers.append(worker)
+
+    try:
+        expected = [0 for _ in range(processes)]
+        depth = 1
+        busy = len(valid_roots) > 0
+        while busy:
+            for connection, count in zip(connections, expected):
+                connection.send(("round", depth, count))
+            expected = [0 for _ in range(processes)]
+            busy = False
+            for connection in connections:
+                _, sent, has_local = receiveFromPartition(connection)
+                for owner in range(processes):
+                    expected[owner] += sent[owner]
+                busy = busy or has_local or any(sent)
+            depth += 1
+
+        for connection in connections:
+            connection.send(("finish",))
+        results = [receiveFromPartition(connection) for connection in connections]
+    finally:
+        for connection in connections:
+            connection.close()
+        for worker in workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+
+    # merge the partitions: owned states are disjoint, so the states of partition p are numbered from offsets[p] on
+    # and every edge is resolved from its pair of store ids without looking any state up again
+    stateStore: StateStore = StateStore()
+    narrativeGraph: nx.DiGraph = nx.DiGraph()
+    eventSet: EventSet = EventSet()
+    terminationStates: Set[NarrativeState] = set()
+    offsets = []
+    for _, states, terminal, _ in results:
+        offsets.append(len(stateStore))
+        for state, is_terminal in zip(states, terminal):
+            state = stateStore.append(canonicalSchemaOf(state, schemas))
+            narrativeGraph.add_node(state)
+            if is_terminal:
+                terminationStates.add(state)
+
+    for partition, (_, _, _, edges) in enumerate(results):
+        for parent_partition, parent_id, child_id, index in edges:
+            parent = stateStore.stateOf(offsets[parent_partition] + parent_id)
+            child = stateStore.stateOf(offsets[partition] + child_id)
+            ch = choices[index]
+            if narrativeGraph.has_edge(parent, child):
+                narrativeGraph[parent][child]["choices"].add(ch)
+            else:
+                narrativeGraph.add_edge(parent, child, choices={ch})
+            eventSet.add(NarrativeEvent(parent, child, ch))
+
+    if printProcess:
+        print("=== PARALLEL MODEL GENERATION ENDED ===")
+
+    return NarrativeModel(set(stateStore.canonical(root) for root in valid_roots),
+                          terminationStates,
+                          deepcopy(setting.terminationConditions),
+                          deepcopy(setting.choices),
+                          eventSet,
+                          narrativeGraph,
+                          stateStore,
+                          choices)
+
+
+# ================================================= Vectorized Generation ==============================================
+
+
+class VectorizedExpander(object):
+    # expands a whole breadth-first layer at once: the states are rows of an integer matrix holding one code per
+    # property slot, every guard becomes a boolean mask over the rows and every assignment a column write
+    def __init__(self, schema: StateSchema, choices: ChoiceTable):
+        self._schema = schema
+        self._choices = choices
+        self._columns: Dict[tuple, int] = dict()
+        self._rowColumns: List[List[int]] = []
+        for entity_name, (row, columns) in sorted(schema.slots.items(), key=lambda item: item[1][0]):
+            row_columns = []
+            for property_name, column in sorted(columns.items(), key=lambda item: item[1]):
+                self._columns[(entity_name, property_name)] = len(self._columns)
+                row_columns.append(len(self._columns) - 1)
+            self._rowColumns.append(row_columns)
+        self._codebooks: List[list] = [[] for _ in self._columns]
+        self._codes: List[dict] = [dict() for _ in self._columns]
+
+        # every value a state can hold comes from the roots or from an assignment, so the codebooks are complete
+        # before expansion starts and the width of a packed row key is known up front
+        self._effects = []
+        for ch in choices:
+            if not ch.isDeclarative:
+                raise TypeError("Choice <" + str(ch) + "> is not declarative and cannot be expanded in batch")
+            assignments = []
+            for step in self._stepsOf(ch._action):
+                row, column = schema.locate(step.entityName, step.propertyName, "Cannot find property with the name")
+                value = schema.validate(row, column, step.propertyName, step.value)
+                assignments.append((self._column(step.entityName, step.propertyName), value))
+            self._effects.append(assignments)
+        self._shifts = None
+
+    def _stepsOf(self, action) -> List[Assign]:
+        if isinstance(action, Assign):
+            return [action]
+        steps = []
+        for step in action.steps:
+            if not isinstance(step, (Assign, Effect)):
+                raise TypeError("Effect step <" + str(step) + "> cannot be expanded in batch")
+            steps.extend(self._stepsOf(step))
+        return steps
+
+    def _column(self, entity_name: string, property_name: string) -> int:
+        if (entity_name, property_name) not in self._columns:
+            raise Exception("Cannot find property with the name <" + entity_name + "." + property_name + ">")
+        return self._columns[(entity_name, property_name)]
+
+    def code(self, column: int, value) -> int:
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(self._codebooks[column])
+            self._codebooks[column].append(value)
+        return codes[value]
+
+    def compile(self, roots: List[NarrativeState]):
+        for root in roots:
+            self.encode([root])
+        for assignments in self._effects:
+            for column, value in assignments:
+                self.code(column, value)
+        self._effects = [[(column, self.code(column, value)) for column, value in assignments]
+                         for assignments in self._effects]
+        widths = [max(1, (len(codebook) - 1).bit_length()) for codebook in self._codebooks]
+        if sum(widths) <= 63:
+            self._shifts = np.cumsum([0] + widths[:-1]).astype(np.int64)
+
+    def encode(self, states: List[NarrativeState]) -> np.ndarray:
+        matrix = np.zeros((len(states), len(self._columns)), dtype=np.int64)
+        for i in range(len(states)):
+            rows = states[i].rows
+            for row, row_columns in enumerate(self._rowColumns):
+                for position, column in enumerate(row_columns):
+                    matrix[i, column] = self.code(column, rows[row][position])
+        return matrix
+
+    def decode(self, codes: np.ndarray) -> FrozenNarrativeState:
+        rows = tuple(tuple(self._codebooks[column][codes[column]] for column in row_columns)
+                     for row_columns in self._rowColumns)
+        state = object.__new__(FrozenNarrativeState)
+        state._schema = self._schema
+        state._values = self._schema.encode(rows)
+        state._hash = None
+        return state
+
+    def keys(self, matrix: np.ndarray) -> np.ndarray:
+        # one int64 per row when the codes fit in 63 bits, else the raw row bytes
+        if self._shifts is not None:
+            return (matrix << self._shifts).sum(axis=1)
+        return np.ascontiguousarray(matrix).view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+
+    def mask(self, term, matrix: np.ndarray) -> np.ndarray:
+        if isinstance(term, Guard):
+            result = np.ones(len(matrix), dtype=bool)
+            for (entity_name, property_name), value in term.conditions.items():
+                column = self._column(entity_name, property_name)
+                result &= matrix[:, column] == self._codes[column].get(value, -1)
+            if term.predicate is not None:
+                result &= self.mask(term.predicate, matrix)
+            return result
+        if isinstance(term, Conjunction):
+            result = np.ones(len(matrix), dtype=bool)
+            for sub_term in term.terms:
+                result &= self.mask(sub_term, matrix)
+            return result
+        if isinstance(term, PropertyTest):
+            column = self._column(term.entityName, term.propertyName)
+            if term.operator in ("in", "not in"):
+                codes = [self._codes[column][value] for value in term.operand if value in self._codes[column]]
+                result = np.isin(matrix[:, column], codes)
+                return result if term.operator == "in" else ~result
+            result = matrix[:, column] == self._codes[column].get(term.operand, -1)
+            return result if term.operator == "==" else ~result
+        raise TypeError("Guard <" + str(term) + "> cannot be evaluated in batch")
+
+    def expand(self, matrix: np.ndarray) -> tuple:
+        # parent row index, choice id and successor codes of every enabled (state, choice) pair, choice by choice
+        parents = []
+        choice_ids = []
+        successors = []
+        for choice_id in range(len(self._choices)):
+            rows = np.nonzero(self.mask(self._choices[choice_id]._pre_condition, matrix))[0]
+            if len(rows) == 0:
+                continue
+            children = matrix[rows]
+            for column, code in self._effects[choice_id]:
+                children[:, column] = code
+            parents.append(rows)
+            choice_ids.append(np.full(len(rows), choice_id))
+            successors.append(children)
+        if len(parents) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), matrix[:0]
+        return np.concatenate(parents), np.concatenate(choice_ids), np.concatenate(successors)
+
+
+def generateNarrativeModelVectorized(setting: NarrationSetting, max_depth: int = math.inf,
+                                     printProcess: bool = True) -> NarrativeModel:
+    # same model as generateNarrativeModel for settings whose choices are all declarative; termination conditions may
+    # be any functions, declarative ones are evaluated in batch as well
+    if printProcess:
+        print("=== VECTORIZED MODEL GENERATION STARTED ===")
+
+    choiceTable: ChoiceTable = choiceTableOf(setting.choices)
+    stateStore: StateStore = StateStore()
+    roots = [root.representative() for root in setting.initialStates]
+    valid_roots = [stateStore.intern(root) for root in roots
+                   if not checkForTermination(root, setting.terminationConditions)]
+    narrativeGraph: nx.DiGraph = nx.DiGraph()
+    eventSet: EventSet = EventSet()
+    terminationStates: Set[NarrativeState] = set()
+
+    if len(set(root.schema for root in valid_roots)) > 1:
+        raise Exception("Cannot generate in batch from initial states of different contexts")
+
+    if len(valid_roots) > 0:
+        expander = VectorizedExpander(valid_roots[0].schema, choiceTable)
+        expander.compile(valid_roots)
+        symmetric = valid_roots[0].schema.symmetric
+        batch_conditions = [cond for cond in setting.terminationConditions
+                            if isinstance(cond, (Guard, Conjunction, PropertyTest))]
+        other_conditions = [cond for cond in setting.terminationConditions if cond not in batch_conditions]
+
+        layer_states = list(valid_roots)
+        layer = expander.encode(layer_states)
+        known: Dict[object, int] = dict(zip(expander.keys(layer).tolist(), range(len(layer_states))))
+        for root in layer_states:
+            narrativeGraph.add_node(root)
+
+        depth = 1
+        while len(layer) > 0:
+            parents, choice_ids, successors = expander.expand(layer)
+            keys = expander.keys(successors)
+            unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+            # only the successors never seen before become states; they form the next layer
+            fresh = np.array([key not in known for key in unique_keys.tolist()], dtype=bool)
+            fresh_rows = successors[first[fresh]]
+            terminal = np.zeros(len(fresh_rows), dtype=bool)
+            for cond in batch_conditions:
+                terminal |= expander.mask(cond, fresh_rows)
+
+            fresh_states = []
+            fresh_codes = []
+            for key, codes, is_terminal in zip(unique_keys[fresh].tolist(), fresh_rows, terminal.tolist()):
+                state = expander.decode(codes)
+                if symmetric:
+                    # several permutations found in one layer share a representative, which may also be known already
+                    state = state.representative()
+                    if state in stateStore:
+                        known[key] = stateStore.idOf(state)
+                        continue
+                    codes = expander.encode([state])[0]
+                state = stateStore.intern(state)
+                if not is_terminal and len(other_conditions) > 0:
+                    is_terminal = checkForTermination(state, other_conditions)
+                known[key] = stateStore.idOf(state)
+                narrativeGraph.add_node(state)
+                if is_terminal:
+                    terminationStates.add(state)
+                fresh_states.append((state, is_terminal))
+                fresh_codes.append(codes)
+
+            unique_states = [stateStore.stateOf(known[key]) for key in unique_keys.tolist()]
+            for parent, choice_id, successor in zip(parents.tolist(), choice_ids.tolist(), inverse.ravel().tolist()):
+                state = layer_states[parent]
+                child = unique_states[successor]
+                ch = choiceTable[choice_id]
+                if narrativeGraph.has_edge(state, child):
+                    narrativeGraph[state][child]["choices"].add(ch)
+                else:
+                    narrativeGraph.add_edge(state, child, choices={ch})
+                eventSet.add(NarrativeEvent(state, child, ch))
+
+            depth += 1
+            expandable = [i for i in range(len(fresh_states)) if not fresh_states[i][1] and depth <= max_depth]
+            layer_states = [fresh_states[i][0] for i in expandable]
+            layer = np.array([fresh_codes[i] for i in expandable], dtype=np.int64).reshape(-1, successors.shape[1])
+
+    if printProcess:
+        print("=== VECTORIZED MODEL GENERATION ENDED ===")
+
+    return NarrativeModel(set(valid_roots),
                           terminationStates,
                           deepcopy(setting.terminationConditions),
                           deepcopy(setting.choices),
                           eventSet,
-                          narrativeGraph)
+                          narrativeGraph,
+                          stateStore,
+                          choiceTable)
+
+
+# ======================================================= Simulation ===================================================
+
+# how a random playthrough ended
+PLAYTHROUGH_ENDED: string = "ended"
+PLAYTHROUGH_DEAD_END: string = "dead end"
+PLAYTHROUGH_UNFINISHED: string = "unfinished"
+
+
+class UniformPolicy(object):
+    # every enabled choice is equally likely
+    def choose(self, state: NarrativeState, enabled: List[NarrativeChoice], step: int, rng: random.Random):
+        return enabled[rng.randrange(len(enabled))]
+
+
+class WeightedPolicy(object):
+    # weights is either a dictionary from choices to weights or a function of (state, choice); choices missing from
+    # the dictionary weigh default_weight, and when every enabled choice weighs nothing the pick is uniform
+    def __init__(self, weights, default_weight: float = 1.0):
+        self._weights = weights
+        self._defaultWeight = default_weight
+
+    def weightOf(self, state: NarrativeState, choice: NarrativeChoice) -> float:
+        if callable(self._weights):
+            return self._weights(state, choice)
+        return self._weights.get(choice, self._defaultWeight)
+
+    def choose(self, state: NarrativeState, enabled: List[NarrativeChoice], step: int, rng: random.Random):
+        weights = [self.weightOf(state, ch) for ch in enabled]
+        if sum(weights) <= 0:
+            return enabled[rng.randrange(len(enabled))]
+        return rng.choices(enabled, weights)[0]
+
+
+class ScriptedPolicy(object):
+    # plays the script while its choices are enabled, then hands over to the fallback policy
+    def __init__(self, script: List[NarrativeChoice], fallback=None):
+        self._script = list(script)
+        self._fallback = fallback if fallback is not None else UniformPolicy()
+
+    def choose(self, state: NarrativeState, enabled: List[NarrativeChoice], step: int, rng: random.Random):
+        if step < len(self._script) and self._script[step] in enabled:
+            return self._script[step]
+        return self._fallback.choose(state, enabled, step, rng)
+
+
+class SimulationReport(object):
+    # tallies of random playthroughs; endings and dead ends are keyed by the (representative) state they stopped at
+    def __init__(self, choices: ChoiceTable, schemas: Dict[StateSchema, StateSchema] = None):
+        self._choices: ChoiceTable = choices
+        self._schemas: Dict[StateSchema, StateSchema] = schemas if schemas is not None else dict()
+        self._playthroughs = 0
+        self._endings: Dict[NarrativeState, int] = dict()
+        self._deadEnds: Dict[NarrativeState, int] = dict()
+        self._unfinished = 0
+        self._choiceCounts: List[int] = [0] * len(choices)
+        self._lengths: Dict[int, int] = dict()
+
+    def __str__(self):
+        s: string = "SIMULATION"
+        s = s + "\n    |---- playthroughs = " + str(self._playthroughs)
+        s = s + "\n    |---- distinct endings = " + str(len(self._endings))
+        s = s + "\n    |---- dead end rate = " + "%.4f" % self.deadEndRate
+        s = s + "\n    |---- unfinished rate = " + "%.4f" % self.unfinishedRate
+        s = s + "\n    |---- choice coverage = " + "%.4f" % self.coverage
+        s = s + "\n    |---- mean length = " + "%.2f" % self.meanLength
+        return s
+
+    def __repr__(self):
+        return str(self)
+
+    def __getstate__(self):
+        # sent back by simulation workers without the choices, which may not be picklable
+        state = dict(self.__dict__)
+        state["_choices"] = None
+        state["_schemas"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def record(self, outcome: string, state: NarrativeState, choice_ids: List[int]):
+        self._playthroughs += 1
+        if outcome == PLAYTHROUGH_ENDED:
+            state = state.representative()
+            self._endings[state] = self._endings.get(state, 0) + 1
+        elif outcome == PLAYTHROUGH_DEAD_END:
+            state = state.representative()
+            self._deadEnds[state] = self._deadEnds.get(state, 0) + 1
+        else:
+            self._unfinished += 1
+        for choice_id in choice_ids:
+            self._choiceCounts[choice_id] += 1
+        self._lengths[len(choice_ids)] = self._lengths.get(len(choice_ids), 0) + 1
+
+    def merge(self, other: 'SimulationReport'):
+        self._playthroughs += other._playthroughs
+        for counts, other_counts in ((self._endings, other._endings), (self._deadEnds, other._deadEnds)):
+            for state, count in other_counts.items():
+                state = canonicalSchemaOf(state, self._schemas)
+                counts[state] = counts.get(state, 0) + count
+        self._unfinished += other._unfinished
+        for choice_id, count in enumerate(other._choiceCounts):
+            self._choiceCounts[choice_id] += count
+        for length, count in other._lengths.items():
+            self._lengths[length] = self._lengths.get(length, 0) + count
+
+    def rateOf(self, count: int) -> float:
+        return count / self._playthroughs if self._playthroughs > 0 else 0.0
+
+    @property
+    def playthroughs(self) -> int:
+        return self._playthroughs
+
+    @property
+    def endingCounts(self) -> Dict[NarrativeState, int]:
+        return self._endings
+
+    @property
+    def endingFrequencies(self) -> Dict[NarrativeState, float]:
+        return {state: self.rateOf(count) for state, count in self._endings.items()}
+
+    @property
+    def deadEndCounts(self) -> Dict[NarrativeState, int]:
+        return self._deadEnds
+
+    @property
+    def deadEndRate(self) -> float:
+        return self.rateOf(sum(self._deadEnds.values()))
+
+    @property
+    def unfinishedRate(self) -> float:
+        return self.rateOf(self._unfinished)
+
+    @property
+    def choiceCounts(self) -> Dict[NarrativeChoice, int]:
+        return {self._choices[choice_id]: count for choice_id, count in enumerate(self._choiceCounts)}
+
+    @property
+    def coverage(self) -> float:
+        if len(self._choiceCounts) == 0:
+            return 1.0
+        return sum(1 for count in self._choiceCounts if count > 0) / len(self._choiceCounts)
+
+    @property
+    def uncoveredChoices(self) -> List[NarrativeChoice]:
+        return [self._choices[choice_id] for choice_id, count in enumerate(self._choiceCounts) if count == 0]
+
+    @property
+    def lengthCounts(self) -> Dict[int, int]:
+        return dict(sorted(self._lengths.items()))
+
+    @property
+    def lengthDistribution(self) -> Dict[int, float]:
+        return {length: self.rateOf(count) for length, count in sorted(self._lengths.items())}
+
+    @property
+    def meanLength(self) -> float:
+        return self.rateOf(sum(length * count for length, count in self._lengths.items()))
+
+
+def playThrough(choices: ChoiceTable, term_conditions: Set[FunctionType], root: NarrativeState, policy,
+                rng: random.Random, max_length: int) -> tuple:
+    # one random walk from root; returns how it stopped, the state it stopped at and the ids of the choices taken
+    state = root.frozen()
+    choice_ids = []
+    while True:
+        if checkForTermination(state, term_conditions):
+            return PLAYTHROUGH_ENDED, state, choice_ids
+        if len(choice_ids) >= max_length:
+            return PLAYTHROUGH_UNFINISHED, state, choice_ids
+        enabled = choices.enabledIds(state)
+        if len(enabled) == 0:
+            return PLAYTHROUGH_DEAD_END, state, choice_ids
+        ch = policy.choose(state, choices.choicesOf(enabled), len(choice_ids), rng)
+        choice_ids.append(choices.idOf(ch))
+        state = ch.Action(state).frozen()
+
+
+def simulateBatch(choices: ChoiceTable, term_conditions: Set[FunctionType], roots: List[NarrativeState], policy,
+                  seed, batch: int, playthroughs: int, max_length: int) -> SimulationReport:
+    # the batch number is folded into the seed, so a batch plays the same way in whichever process runs it
+    rng = random.Random(str(seed) + "/" + str(batch))
+    report = SimulationReport(choices)
+    for _ in range(playthroughs):
+        root = roots[rng.randrange(len(roots))]
+        report.record(*playThrough(choices, term_conditions, root, policy, rng, max_length))
+    return report
+
+
+def runSimulationWorker(connection,
+                        choices: ChoiceTable,
+                        term_conditions: Set[FunctionType],
+                        roots: List[NarrativeState],
+                        policy,
+                        seed,
+                        max_length: int):
+    try:
+        while True:
+            message = connection.recv()
+            if message[0] == "finish":
+                return
+            _, batch, playthroughs = message
+            connection.send(("batch", batch, simulateBatch(choices, term_conditions, roots, policy, seed, batch,
+                                                           playthroughs, max_length)))
+    except BaseException:
+        connection.send(("error", traceback.format_exc()))
+
+
+def simulateNarrative(setting: NarrationSetting, playthroughs: int, policy=None, seed=0, max_length: int = 1000,
+                      processes: int = None, batch_size: int = 10000, printProcess: bool = True) -> SimulationReport:
+    # Monte Carlo estimates for narratives too large to generate: playthroughs random walks from the initial states,
+    # each stopping at a termination state, a dead end or after max_length choices. The walks are cut into batches of
+    # batch_size with a seed of their own, so the report depends on seed and batch_size but not on processes
+    if printProcess:
+        print("=== SIMULATION STARTED ===")
+    if processes is None:
+        processes = os.cpu_count() or 1
+    policy = policy if policy is not None else UniformPolicy()
+
+    choices: ChoiceTable = choiceTableOf(setting.choices)
+    # sorted, since the iteration order of a set of states differs between processes
+    roots = sorted((root.frozen() for root in setting.initialStates), key=lambda root: repr(root.rows))
+    if len(roots) == 0:
+        raise Exception("Cannot simulate a narration setting without initial states")
+    report = SimulationReport(choices, {root.schema: root.schema for root in roots})
+    batches = [(batch, min(batch_size, playthroughs - first))
+               for batch, first in enumerate(range(0, playthroughs, batch_size))]
+
+    if processes <= 1 or len(batches) <= 1:
+        for batch, count in batches:
+            report.merge(simulateBatch(choices, setting.terminationConditions, roots, policy, seed, batch, count,
+                                       max_length))
+    else:
+        # forked workers inherit the setting, so lambdas in choices and conditions need not be picklable
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("fork")
+        else:
+            mp_context = multiprocessing.get_context()
+
+        connections = []
+        workers = []
+        for _ in range(min(processes, len(batches))):
+            parent_end, child_end = mp_context.Pipe()
+            worker = mp_context.Process(target=runSimulationWorker,
+                                        args=(child_end, choices, setting.terminationConditions, roots, policy, seed,
+                                              max_length),
+                                        daemon=True)
+            worker.start()
+            child_end.close()
+            connections.append(parent_end)
+            workers.append(worker)
+
+        try:
+            # every worker gets a new batch as soon as it returns one
+            pending = deque(batches)
+            for connection in connections:
+                if len(pending) > 0:
+                    connection.send(("batch",) + pending.popleft())
+            remaining = len(batches)
+            while remaining > 0:
+                for connection in multiprocessing.connection.wait(connections):
+                    reply = connection.recv()
+                    if reply[0] == "error":
+                        raise Exception("Simulation worker failed:\n" + reply[1])
+                    report.merge(reply[2])
+                    remaining -= 1
+                    if len(pending) > 0:
+                        connection.send(("batch",) + pending.popleft())
+            for connection in connections:
+                connection.send(("finish",))
+        finally:
+            for connection in connections:
+                connection.close()
+            for worker in workers:
+                worker.join(1)
+                if worker.is_alive():
+                    worker.terminate()
+
+    if printProcess:
+        print(report)
+        print("=== SIMULATION ENDED ===")
+    return report
+
+
+# ===================================================== Access Analysis ================================================
+
+
+def inferAccessSets(setting: NarrationSetting, sample_limit: int = 256) -> Set[tuple]:
+    # runs every precondition, action and termination condition on recording states reachable from the initial
+    # states; the sets are the union of what was observed. They are only complete if the whole reachable space fits in
+    # sample_limit states: when the sampling is cut short every inferred set is None (unknown), as is the set of a
+    # function that raises or is never run. Sets a declarative guard or effect knows up front are kept either way.
+    # the sets are stored on the choices and the setting; the termination read set is also returned
+    choices: ChoiceTable = choiceTableOf(setting.choices)
+    guard_reads: List[Set[tuple]] = [set() for _ in choices]
+    action_reads: List[Set[tuple]] = [set() for _ in choices]
+    writes: List[Set[tuple]] = [set() for _ in choices]
+    termination_reads: Set[tuple] = set()
+    guard_runs: List[bool] = [False for _ in choices]
+    action_runs: List[bool] = [False for _ in choices]
+    truncated = False
+
+    def record(target: List[Set[tuple]], index: int, accessed: Set[tuple]):
+        if target[index] is not None:
+            target[index] |= accessed
+
+    def firstKnown(declared: Set[tuple], inferred: Set[tuple]) -> Set[tuple]:
+        return declared if declared is not None else inferred
+
+    store = StateStore()
+    frontier = deque()
+    for root in setting.initialStates:
+        if root in store:
+            continue
+        if len(store) >= sample_limit:
+            truncated = True
+            break
+        frontier.append((store.intern(root), True))
+
+    while len(frontier) > 0:
+        state, is_root = frontier.popleft()
+
+        terminal = False
+        for cond in setting.terminationConditions:
+            proxy = RecordingNarrativeState(state)
+            try:
+                terminal = cond(proxy) or terminal
+            except Exception:
+                termination_reads = None
+                continue
+            if termination_reads is not None:
+                termination_reads |= proxy.reads
+        if terminal and not is_root:
+            continue
+
+        for index in range(len(choices)):
+            ch = choices[index]
+            proxy = RecordingNarrativeState(state)
+            try:
+                enabled = ch._pre_condition(proxy)
+            except Exception:
+                guard_reads[index] = None
+                continue
+            guard_runs[index] = True
+            record(guard_reads, index, proxy.reads)
+            if isinstance(ch._pre_condition, Guard):
+                # a failing equality test hides the ones after it, but the guard depends on all of them
+                record(guard_reads, index, ch._pre_condition.keys)
+            if not enabled:
+                continue
+
+            proxy = RecordingNarrativeState(state)
+            try:
+                result = ch._action(proxy)
+            except Exception:
+                action_reads[index] = None
+                writes[index] = None
+                continue
+            action_runs[index] = True
+            record(action_reads, index, proxy.reads)
+            record(writes, index, proxy.writes)
+
+            # an action may hand back a different object than the one it was given
+            child = result.snapshot() if isinstance(result, RecordingNarrativeState) else result.frozen()
+            if child in store:
+                continue
+            if len(store) >= sample_limit:
+                truncated = True
+                continue
+            frontier.append((store.intern(child), False))
+
+    for index in range(len(choices)):
+        ch = choices[index]
+        if ch.isDeclarative:
+            continue
+        if truncated or not guard_runs[index]:
+            guard_reads[index] = None
+        if truncated or not action_runs[index]:
+            action_reads[index] = None
+            writes[index] = None
+        ch.setAccessSets(firstKnown(getattr(ch._pre_condition, "reads", None), guard_reads[index]),
+                         firstKnown(getattr(ch._action, "reads", None), action_reads[index]),
+                         firstKnown(getattr(ch._action, "writes", None), writes[index]))
+    if truncated or (len(setting.terminationConditions) > 0 and len(store) == 0):
+        termination_reads = None
+    setting.terminationReadSet = None if termination_reads is None else frozenset(termination_reads)
+    return setting.terminationReadSet
 
 
 # ============================================= Narration Processing Functions =========================================
@@ -804,6 +4496,10 @@ def generateNarrativeModel(setting: NarrationSetting, max_depth: int = math.inf,
 def subModelFrom(states: StateSet, narration: NarrativeModel) -> NarrativeModel:
     choices = deepcopy(narration.choices)
     termination_conditions = deepcopy(narration.terminationConditions)
+    if isinstance(narration, LazyNarrativeModel):
+        return LazyNarrativeModel(NarrationSetting(initial_states=states,
+                                                   choices=choices,
+                                                   termination_conditions=termination_conditions))
     return generateNarrativeModel(NarrationSetting(initial_states=states,
                                                    choices=choices,
                                                    termination_conditions=termination_conditions),
@@ -814,7 +4510,7 @@ def subModelFrom(states: StateSet, narration: NarrativeModel) -> NarrativeModel:
 def filterStates(filter_func: FunctionType, states: StateSet) -> StateSet:
     filtered_set: Set = StateSet()
     for state in states:
-        if filter_func(state):
+        if filter_func(state.frozen()):
             filtered_set.add(state)
     return filtered_set
 
@@ -824,7 +4520,10 @@ def statesOf(context: object) -> StateSet:
         return StateSet(context.narrativeGraph.nodes)
     elif isinstance(context, StateSet):
         return context
-    elif isinstance(context, EventSet):
+    elif isinstance(context, DiskStateStore):
+        # too large to copy into a StateSet: the store itself streams its states to the filters
+        return context
+    elif isinstance(context, (EventSet, StoredEventSet)):
         to_ret = StateSet()
         for event in context:
             to_ret.add(event.PreState)
@@ -849,6 +4548,10 @@ def preStatesOf(event_set: EventSet) -> StateSet:
 
 
 def choicesOf(context: object) -> ChoiceSet:
+    if isinstance(context, DiskStateStore):
+        context = StoredEventSet(context)
+    if isinstance(context, StoredEventSet):
+        return ChoiceSet(ch for ch in context.store.choices if contains(ch, context))
     if isinstance(context, EventSet):
         to_ret = ChoiceSet()
         for event in context:
@@ -862,6 +4565,8 @@ def choicesOf(context: object) -> ChoiceSet:
 
 
 def eventsIn(narration: NarrativeModel) -> EventSet:
+    if isinstance(narration, DiskStateStore):
+        return StoredEventSet(narration)
     return deepcopy(narration.eventSet)
 
 
@@ -941,6 +4646,20 @@ def contains(to_contain: object, container: object) -> bool:
     elif isinstance(container, EventSet) and isinstance(to_contain, NarrativeEvent):
         return to_contain in container
 
+    # searching in a generation written to a DiskStateStore, without reading it back
+    elif isinstance(container, DiskStateStore) and isinstance(to_contain, NarrativeState):
+        return to_contain in container
+
+    elif isinstance(container, StoredEventSet) and isinstance(to_contain, NarrativeEvent):
+        return to_contain in container
+
+    elif isinstance(container, StoredEventSet) and isinstance(to_contain, NarrativeState):
+        return to_contain in container.store and container.store.hasEdgesAt(container.store.idOf(to_contain))
+
+    elif isinstance(container, StoredEventSet) and isinstance(to_contain, NarrativeChoice):
+        return to_contain in container.store.choices and \
+               container.store.hasEdgesBy(container.store.choices.idOf(to_contain))
+
     # searching for an State in a Narration
     elif isinstance(container, NarrativeModel) and isinstance(to_contain, NarrativeState):
         return to_contain in container.narrativeGraph.nodes
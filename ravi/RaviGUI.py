@@ -968,7 +968,7 @@ class appElement(WidgetElement):
 
         return app
 
-    def generateCode(self, globals_list) -> str:
+    def generateCode(self, globals_list, lazy: bool = False) -> str:
         code = ""
         code = code + "from enum import *" + '\n'
         code = code + "from ravi.Ravi import *" + '\n' + '\n'
@@ -984,7 +984,11 @@ class appElement(WidgetElement):
 
         code = code + "initial_states = {NarrativeState(context)}" + '\n'
         code = code + "settings: NarrationSetting = NarrationSetting(initial_states=initial_states, termination_conditions=term_conditions, choices=choices)" + '\n'
-        code = code + "self.model: NarrativeModel = generateNarrativeModel(setting=settings, max_depth=math.inf)" + '\n'
+        if lazy:
+            # play sessions only need the states they walk through, so the model grows as the player moves
+            code = code + "self.model: NarrativeModel = LazyNarrativeModel(setting=settings)" + '\n'
+        else:
+            code = code + "self.model: NarrativeModel = generateNarrativeModel(setting=settings, max_depth=math.inf)" + '\n'
         # code = code + "model.runNarration(False, NarrativeState(context))" + '\n'
 
         code = code + "self.model.drawNarrationGraph(show_state=False, show_choices={}, show_plot=False, rotate_labels={})".format(
@@ -992,7 +996,7 @@ class appElement(WidgetElement):
 
         return code
 
-    def getModelGenerationCode(self) -> str:
+    def getModelGenerationCode(self, lazy: bool = False) -> str:
         globals_list = []
         constants = self.constant_list.generateCode(globals_list).split('\n')
         for c in constants:
@@ -1014,13 +1018,13 @@ class appElement(WidgetElement):
             if not q_name.isspace() and q_name != "":
                 globals_list.append(q_name)
 
-        code_str = self.generateCode(globals_list)
+        code_str = self.generateCode(globals_list, lazy)
         return code_str
 
-    def executeModelGenerationCode(self):
+    def executeModelGenerationCode(self, lazy: bool = False):
         plt.clf()
 
-        code_str = self.getModelGenerationCode()
+        code_str = self.getModelGenerationCode(lazy)
         print(code_str)
         exec(code_str)
 
@@ -1083,17 +1087,19 @@ class appElement(WidgetElement):
         self.assertion_results_label.pack(padx=5, pady=(5, 5), expand=True, fill=tk.X)
 
     def start_play(self):
-        self.executeModelGenerationCode()
+        self.executeModelGenerationCode(lazy=True)
         self.play_visited_states.clear()
         self.current_play_state = list(self.model.initialStates)[0]
         self.show_choice_buttons()
 
     def shouldContinuePlay(self):
-        return len(getPossibleChoices(self.current_play_state, self.model.choices)) > 0 and \
-               not (self.current_play_state in self.model.terminationStates)
+        return len(getPossibleChoices(self.current_play_state, self.model.choiceTable)) > 0 and \
+               not self.model.isTerminal(self.current_play_state)
 
     def show_choice_buttons(self):
         self.play_visited_states.append(self.current_play_state)
+        # brings the successors of the current state into the graph drawn below
+        self.model.successors(self.current_play_state)
 
         try:
             self.play_preview_frame.pack_forget()
@@ -1130,7 +1136,7 @@ class appElement(WidgetElement):
             if child != self.options_label:
                 child.pack_forget()
 
-        possible_choices = getPossibleChoices(self.current_play_state, self.model.choices)
+        possible_choices = getPossibleChoices(self.current_play_state, self.model.choiceTable)
         for index, choice in possible_choices.items():
             option_btn = tk.Button(self.options_frame,
                                    text="[" + str(index) + "] : " + str(choice),
@@ -1145,7 +1151,7 @@ class appElement(WidgetElement):
         if not self.shouldContinuePlay():
             return
 
-        possible_choices = getPossibleChoices(self.current_play_state, self.model.choices)
+        possible_choices = getPossibleChoices(self.current_play_state, self.model.choiceTable)
         self.current_play_state = possible_choices[option_index].Action(self.current_play_state)
         self.show_choice_buttons()
 
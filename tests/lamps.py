@@ -0,0 +1,46 @@
+from ravi.Ravi import *
+
+# shared by the tests: every lamp is switched on and off independently, so n lamps give 2^n states and n * 2^n events
+
+
+def lampName(index: int) -> string:
+    return "lamp " + str(index)
+
+
+def switchTo(lamp: string, is_on: bool):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(lamp, "is on", is_on)
+        return w
+
+    return action
+
+
+def buildSetting(lamp_count: int, packed: bool = False, symmetric: bool = False) -> NarrationSetting:
+    class_lamp = EntityClass()
+    class_lamp.addProperty("is on", bool, False)
+
+    context = NarrativeContext(packed)
+    for i in range(lamp_count):
+        context.addEntity(lampName(i), class_lamp)
+    if symmetric:
+        context.addSymmetry([lampName(i) for i in range(lamp_count)])
+
+    choices = []
+    for i in range(lamp_count):
+        choices.append(NarrativeChoice(lambda w, lamp=lampName(i): not w.getValue(lamp, "is on"),
+                                       switchTo(lampName(i), True), "switch on " + lampName(i)))
+        choices.append(NarrativeChoice(lambda w, lamp=lampName(i): w.getValue(lamp, "is on"),
+                                       switchTo(lampName(i), False), "switch off " + lampName(i)))
+    return NarrationSetting(initial_states={NarrativeState(context)}, choices=choices, termination_conditions=set())
+
+
+def eventKeys(events) -> Set[tuple]:
+    return set((event.PreState.rows, event.PostState.rows, str(event.Choice)) for event in events)
+
+
+def modelKeys(model: NarrativeModel) -> tuple:
+    # everything two generations of the same setting must agree on, independent of object identity
+    return (set(state.rows for state in model.narrativeGraph.nodes),
+            eventKeys(model.eventSet),
+            set(state.rows for state in model.terminationStates),
+            set(state.rows for state in model.initialStates))
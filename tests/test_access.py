@@ -0,0 +1,77 @@
+from ravi.Ravi import *
+
+LAMP_COUNT = 4
+
+
+# ======================================================= Context ======================================================
+
+
+def lampName(index: int) -> string:
+    return "lamp " + str(index)
+
+
+def switchOn(lamp: string):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(lamp, "is on", True)
+        return w
+
+    return action
+
+
+def buildSetting() -> NarrationSetting:
+    # 2^n states; "repair" is never enabled, since no lamp is ever broken
+    class_lamp = EntityClass()
+    class_lamp.addProperty("is on", bool, False)
+    class_lamp.addProperty("is broken", bool, False)
+
+    context = NarrativeContext()
+    for i in range(LAMP_COUNT):
+        context.addEntity(lampName(i), class_lamp)
+
+    choices = [NarrativeChoice(lambda w, lamp=lampName(i): not w.getValue(lamp, "is on"), switchOn(lampName(i)),
+                               "switch on " + lampName(i))
+               for i in range(LAMP_COUNT)]
+    choices.append(NarrativeChoice(lambda w: w.getValue(lampName(0), "is broken"), switchOn(lampName(0)), "repair"))
+    choices.append(NarrativeChoice(guardOf(equals(lampName(1), "is on", False)), assign(lampName(1), "is on", True),
+                                   "declared"))
+    return NarrationSetting(initial_states={NarrativeState(context)},
+                            choices=choices,
+                            termination_conditions={lambda w: w.getValue(lampName(0), "is on")})
+
+
+def choiceNamed(setting: NarrationSetting, name: string) -> NarrativeChoice:
+    return next(ch for ch in setting.choices if str(ch) == name)
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_access_sets_are_inferred_when_the_whole_space_is_sampled():
+    setting = buildSetting()
+    termination_reads = inferAccessSets(setting)
+    switch = choiceNamed(setting, "switch on " + lampName(2))
+
+    assert termination_reads == {(lampName(0), "is on")}
+    assert switch.guardReadSet == {(lampName(2), "is on")}
+    assert switch.writeSet == {(lampName(2), "is on")}
+
+
+def test_actions_that_never_run_have_unknown_access_sets():
+    setting = buildSetting()
+    inferAccessSets(setting)
+    repair = choiceNamed(setting, "repair")
+
+    assert repair.guardReadSet == {(lampName(0), "is broken")}
+    assert repair.actionReadSet is None
+    assert repair.writeSet is None
+
+
+def test_truncated_sampling_leaves_only_declared_access_sets():
+    setting = buildSetting()
+    termination_reads = inferAccessSets(setting, sample_limit=2 ** LAMP_COUNT - 1)
+    declared = choiceNamed(setting, "declared")
+
+    assert termination_reads is None
+    assert all(ch.guardReadSet is None and ch.writeSet is None for ch in setting.choices if ch is not declared)
+    assert declared.guardReadSet == {(lampName(1), "is on")}
+    assert declared.writeSet == {(lampName(1), "is on")}
@@ -0,0 +1,52 @@
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, modelKeys
+
+LAMP_COUNT = 8
+
+
+# ======================================================== Tests =======================================================
+
+
+@pytest.mark.parametrize("budget, reason", [(GenerationBudget(states=50), "states"),
+                                            (GenerationBudget(edges=50), "edges"),
+                                            (GenerationBudget(seconds=0), "time"),
+                                            (GenerationBudget(memory=1), "memory")],
+                         ids=["states", "edges", "time", "memory"])
+def test_budget_stops_generation(budget, reason):
+    if reason == "memory" and currentMemory() is None:
+        pytest.skip("the resident set size cannot be read on this platform")
+    model = generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False, budget=budget)
+
+    assert model.report.reason == reason
+    assert not model.report.complete
+    assert not model.isComplete
+    assert len(model.narrativeGraph.nodes) < 2 ** LAMP_COUNT
+
+
+def test_report_counts_what_the_model_holds():
+    model = generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False, budget=GenerationBudget(states=50))
+
+    assert model.report.stateCount == len(model.narrativeGraph.nodes) >= 50
+    assert model.report.edgeCount == model.narrativeGraph.number_of_edges()
+    assert model.report.frontier == model.frontierStates
+
+
+def test_unexpanded_states_are_not_dead_ends():
+    model = generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False, budget=GenerationBudget(states=50))
+
+    assert len(model.frontierStates) > 0
+    assert all(model.narrativeGraph.out_degree[state] == 0 for state in model.frontierStates)
+    assert len(set(model.frontierStates) & set(model.deadEnds)) == 0
+
+
+def test_generation_within_budget_is_complete():
+    model = generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False,
+                                   budget=GenerationBudget(seconds=600, states=10 ** 6, edges=10 ** 6))
+
+    assert model.report.complete
+    assert model.isComplete
+    assert len(model.report.frontier) == 0
+    assert model.report.stateCount == 2 ** LAMP_COUNT
+    assert modelKeys(model) == modelKeys(generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False))
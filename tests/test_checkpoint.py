@@ -0,0 +1,26 @@
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, lampName, modelKeys, switchTo
+
+LAMP_COUNT = 4
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_resumed_generation_matches_the_model(tmp_path):
+    checkpoint = str(tmp_path / "lamps.checkpoint")
+    generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False, budget=GenerationBudget(states=5),
+                           checkpoint=checkpoint)
+    resumed = resumeNarrativeModel(checkpoint, buildSetting(LAMP_COUNT), printProcess=False)
+
+    assert modelKeys(resumed) == modelKeys(generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False))
+
+
+def test_checkpoints_reject_choices_sharing_a_name(tmp_path):
+    setting = buildSetting(LAMP_COUNT)
+    setting.choices.append(NarrativeChoice(lambda w: True, switchTo(lampName(0), True), str(setting.choices[0])))
+
+    with pytest.raises(Exception, match="more than one choice"):
+        generateNarrativeModel(setting, printProcess=False, checkpoint=str(tmp_path / "lamps.checkpoint"))
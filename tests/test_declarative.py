@@ -0,0 +1,37 @@
+from ravi.Ravi import *
+
+
+# ======================================================= Context ======================================================
+
+
+def countChoice(value) -> NarrativeChoice:
+    return NarrativeChoice(guardOf(notEquals("counter", "value", value)), assign("counter", "value", value),
+                           "set counter to " + repr(value))
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_assignments_tell_values_of_different_types_apart():
+    assert assign("counter", "value", True) != assign("counter", "value", 1)
+    assert assign("counter", "value", 1) != assign("counter", "value", 1.0)
+    assert assign("counter", "value", 1) == assign("counter", "value", 1)
+
+
+def test_property_tests_tell_operands_of_different_types_apart():
+    assert equals("counter", "value", True) != equals("counter", "value", 1)
+    assert isIn("counter", "value", [True]) != isIn("counter", "value", [1])
+    assert isIn("counter", "value", [1, 2]) == isIn("counter", "value", [2, 1])
+
+
+def test_choices_differing_only_in_value_types_are_different():
+    assert guardOf(equals("counter", "value", True)) != guardOf(equals("counter", "value", 1))
+    assert countChoice(True) != countChoice(1)
+    assert len(ChoiceTable([countChoice(True), countChoice(1)])) == 2
+
+
+def test_saved_choices_keep_the_types_of_their_values(tmp_path):
+    choices = [countChoice(True), countChoice(1)]
+    saveChoices(str(tmp_path / "choices.json"), choices)
+
+    assert loadChoices(str(tmp_path / "choices.json")) == choices
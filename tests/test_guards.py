@@ -0,0 +1,76 @@
+from copy import copy, deepcopy
+
+from ravi.Ravi import *
+
+ROOM = ("player", "room")
+HAS_KEY = ("player", "has key")
+
+
+# ======================================================= Context ======================================================
+
+
+def setTo(key: tuple, value):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(key[0], key[1], value)
+        return w
+
+    return action
+
+
+def hasKey(w: NarrativeState) -> bool:
+    return w.getValue(*HAS_KEY)
+
+
+def buildSetting() -> NarrationSetting:
+    # equality-only guards, a guard with a predicate and a plain function precondition side by side
+    class_player = EntityClass()
+    class_player.addProperty("room", int, 0)
+    class_player.addProperty("has key", bool, False)
+    class_player.addProperty("is out", bool, False)
+
+    context = NarrativeContext()
+    context.addEntity("player", class_player)
+
+    choices = [NarrativeChoice(Guard({ROOM: 0}), setTo(ROOM, 1), "enter hall"),
+               NarrativeChoice(Guard({ROOM: 1}), setTo(ROOM, 2), "enter vault"),
+               NarrativeChoice(Guard({ROOM: 1, HAS_KEY: False}), setTo(HAS_KEY, True), "take key"),
+               NarrativeChoice(Guard({ROOM: 2}, hasKey), setTo(("player", "is out"), True), "open door"),
+               NarrativeChoice(lambda w: w.getValue(*ROOM) != 0, setTo(ROOM, 0), "go back")]
+    return NarrationSetting(initial_states={NarrativeState(context)}, choices=choices, termination_conditions=set())
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_guard_index_enables_the_choices_their_preconditions_do():
+    setting = buildSetting()
+    table = ChoiceTable(setting.choices)
+    model = generateNarrativeModel(setting, printProcess=False)
+
+    assert table.guardIndex.guardCount == 4
+    for state in model.narrativeGraph.nodes:
+        assert sorted(table.enabledIds(state)) == [i for i in range(len(table)) if table[i].PreCondition(state)]
+
+
+def test_guards_compare_by_value():
+    assert Guard({ROOM: 1, HAS_KEY: False}) == Guard({HAS_KEY: False, ROOM: 1})
+    assert hash(Guard({ROOM: 1}, hasKey)) == hash(Guard({ROOM: 1}, hasKey))
+    assert Guard({ROOM: 1}) != Guard({ROOM: 2})
+    assert Guard({ROOM: 1}) != Guard({ROOM: 1}, hasKey)
+
+
+def test_guards_are_shared_by_copies():
+    guard = Guard({ROOM: 1})
+
+    assert copy(guard) is guard
+    assert deepcopy(guard) is guard
+
+
+def test_choices_on_guards_are_found_through_their_copies():
+    setting = buildSetting()
+    model = generateNarrativeModel(setting, printProcess=False)
+    take_key = deepcopy(setting.choices[2])
+
+    assert take_key == setting.choices[2]
+    assert contains(take_key, choicesOf(model))
+    assert len(filterEventsByChoice(ChoiceSet({take_key}), eventsIn(model))) > 0
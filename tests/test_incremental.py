@@ -0,0 +1,49 @@
+from copy import copy, deepcopy
+
+import pytest
+
+from ravi.Ravi import *
+
+
+# ======================================================= Context ======================================================
+
+
+def setA(w: NarrativeState) -> NarrativeState:
+    w.setValue("player", "a", True)
+    return w
+
+
+def setB(w: NarrativeState) -> NarrativeState:
+    w.setValue("player", "b", True)
+    return w
+
+
+def buildSetting(pre_condition) -> NarrationSetting:
+    class_player = EntityClass()
+    class_player.addProperty("a", bool, False)
+    class_player.addProperty("b", bool, False)
+
+    context = NarrativeContext()
+    context.addEntity("player", class_player)
+
+    choices = [NarrativeChoice(lambda w: not w.getValue("player", "a"), setA, "set a"),
+               NarrativeChoice(pre_condition, setB, "set b")]
+    return NarrationSetting(initial_states={NarrativeState(context)}, choices=choices, termination_conditions=set())
+
+
+# ======================================================== Tests =======================================================
+
+
+@pytest.mark.parametrize("pre_condition", [
+    lambda w: copy(w).getValue("player", "a"),
+    lambda w: deepcopy(w).getValue("player", "a"),
+    lambda w: w.rows[0][0],
+    lambda w: "a = True" in str(w),
+], ids=["copy", "deepcopy", "rows", "str"])
+def test_incremental_enabledness_records_reads_made_through_the_whole_state(pre_condition):
+    incremental = generateNarrativeModel(buildSetting(pre_condition), printProcess=False)
+    exhaustive = generateNarrativeModel(buildSetting(pre_condition), printProcess=False, incremental=False)
+
+    assert len(exhaustive.narrativeGraph.nodes) == 3
+    assert set(state.rows for state in incremental.narrativeGraph.nodes) == \
+           set(state.rows for state in exhaustive.narrativeGraph.nodes)
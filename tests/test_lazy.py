@@ -0,0 +1,81 @@
+from ravi.Ravi import *
+from tests.lamps import buildSetting, eventKeys, lampName, modelKeys
+
+LAMP_COUNT = 4
+
+
+# ======================================================= Context ======================================================
+
+
+def twoLampsOn(w: NarrativeState) -> bool:
+    return sum(1 for i in range(LAMP_COUNT) if w.getValue(lampName(i), "is on")) == 2
+
+
+def buildEndingSetting(symmetric: bool = False) -> NarrationSetting:
+    setting = buildSetting(LAMP_COUNT, symmetric=symmetric)
+    setting.terminationConditions = {twoLampsOn}
+    return setting
+
+
+def bothModels(setting_factory) -> tuple:
+    return generateNarrativeModel(setting_factory(), printProcess=False), LazyNarrativeModel(setting_factory())
+
+
+def withLampsOn(model: NarrativeModel, lamps: List[int]) -> NarrativeState:
+    state = copy(next(iter(model.initialStates)))
+    for i in lamps:
+        state.setValue(lampName(i), "is on", True)
+    return state
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_lazy_model_offers_the_choices_of_the_eager_model():
+    eager, lazy = bothModels(buildEndingSetting)
+
+    # the eager graph lists its states in discovery order, so the lazy model has found each one before it is asked
+    for state in eager.narrativeGraph.nodes:
+        assert eventKeys(lazy.eventsFrom(state)) == eventKeys(eager.eventsFrom(state))
+
+
+def test_lazy_model_only_expands_the_states_it_is_asked_about():
+    lazy = LazyNarrativeModel(buildEndingSetting())
+    lazy.successors(next(iter(lazy.initialStates)))
+
+    assert len(lazy.frontierStates) == LAMP_COUNT
+    assert not lazy.isComplete
+
+
+def test_lazy_model_ends_where_the_eager_model_does():
+    eager, lazy = bothModels(buildEndingSetting)
+
+    for state in eager.narrativeGraph.nodes:
+        assert lazy.isTerminal(state) == eager.isTerminal(state)
+    assert modelKeys(lazy) == modelKeys(eager)
+    assert set(state.rows for state in lazy.deadEnds) == set(state.rows for state in eager.deadEnds)
+
+
+def test_lazy_and_eager_models_agree_on_terminal_initial_states():
+    def endsAtOnce() -> NarrationSetting:
+        setting = buildSetting(LAMP_COUNT)
+        setting.terminationConditions = {lambda w: not w.getValue(lampName(0), "is on")}
+        return setting
+
+    eager, lazy = bothModels(endsAtOnce)
+    root = next(iter(endsAtOnce().initialStates))
+
+    assert len(lazy.initialStates) == len(eager.initialStates) == 0
+    assert lazy.isTerminal(root) and eager.isTerminal(root)
+    assert modelKeys(lazy) == modelKeys(eager)
+
+
+def test_lazy_and_eager_models_agree_on_permutations_of_symmetric_states():
+    eager, lazy = bothModels(lambda: buildEndingSetting(symmetric=True))
+    # the representatives have the lamps that are on last
+    permuted = withLampsOn(eager, [0, 1])
+
+    assert permuted not in eager.narrativeGraph.nodes
+    assert lazy.isTerminal(permuted) and eager.isTerminal(permuted)
+    lazy.successors(next(iter(lazy.initialStates)))
+    assert eventKeys(lazy.eventsFrom(withLampsOn(eager, [0]))) == eventKeys(eager.eventsFrom(withLampsOn(eager, [0])))
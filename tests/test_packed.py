@@ -0,0 +1,92 @@
+from enum import Enum
+
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, lampName, modelKeys
+
+
+class DoorState(Enum):
+    OPEN = 0
+    CLOSED = 1
+    LOCKED = 2
+
+
+# ======================================================= Context ======================================================
+
+
+def buildDoorContext(packed: bool) -> NarrativeContext:
+    # the Enum and the bool go into the bit field; the int and the str, which no field can hold, into the side tuple
+    class_door = EntityClass()
+    class_door.addProperty("state", DoorState, DoorState.CLOSED)
+    class_door.addProperty("is painted", bool, False)
+    class_door.addProperty("knocks", int, 0)
+    class_door.addProperty("sign", str, "")
+
+    context = NarrativeContext(packed)
+    context.addEntity("door", class_door)
+    return context
+
+
+def setTo(property_name: string, value):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue("door", property_name, value)
+        return w
+
+    return action
+
+
+def knock(w: NarrativeState) -> NarrativeState:
+    w.setValue("door", "knocks", w.getValue("door", "knocks") + 2 ** 70)
+    return w
+
+
+def buildDoorSetting(packed: bool) -> NarrationSetting:
+    choices = [NarrativeChoice(lambda w, state=state: w.getValue("door", "state") != state, setTo("state", state),
+                               "make door " + state.name)
+               for state in DoorState]
+    choices.append(NarrativeChoice(lambda w: not w.getValue("door", "is painted"), setTo("is painted", True), "paint"))
+    choices.append(NarrativeChoice(lambda w: w.getValue("door", "knocks") < 2 ** 71, knock, "knock"))
+    choices.append(NarrativeChoice(lambda w: w.getValue("door", "sign") == "", setTo("sign", "keep out"), "sign"))
+    return NarrationSetting(initial_states={NarrativeState(buildDoorContext(packed))},
+                            choices=choices,
+                            termination_conditions={lambda w: w.getValue("door", "state") == DoorState.LOCKED})
+
+
+def packedLamps(lamp_count: int) -> NarrativeState:
+    return next(iter(buildSetting(lamp_count, packed=True).initialStates))
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_packed_states_read_back_the_values_written():
+    packed = NarrativeState(buildDoorContext(True))
+    unpacked = NarrativeState(buildDoorContext(False))
+    for w in (packed, unpacked):
+        w.setValue("door", "state", DoorState.LOCKED)
+        w.setValue("door", "is painted", True)
+        w.setValue("door", "knocks", 2 ** 70)
+        w.setValue("door", "sign", "keep out")
+
+    assert isinstance(packed.schema, PackedStateSchema)
+    assert packed.rows == unpacked.rows
+    assert packed.getValue("door", "knocks") == 2 ** 70
+
+
+def test_packed_generation_matches_the_unpacked_model():
+    assert modelKeys(generateNarrativeModel(buildDoorSetting(True), printProcess=False)) == \
+           modelKeys(generateNarrativeModel(buildDoorSetting(False), printProcess=False))
+
+
+@pytest.mark.parametrize("lamp_count", [6, 70], ids=["one word", "wider than a word"])
+def test_packed_states_are_equal_by_value(lamp_count):
+    first = packedLamps(lamp_count)
+    second = packedLamps(lamp_count)
+    first.setValue(lampName(lamp_count - 1), "is on", True)
+    second.setValue(lampName(lamp_count - 1), "is on", True)
+
+    assert first.schema.bitCount == lamp_count
+    assert first == second
+    assert hash(first) == hash(second)
+    assert first != packedLamps(lamp_count)
@@ -0,0 +1,28 @@
+from ravi.Ravi import *
+from tests.lamps import buildSetting, modelKeys
+
+LAMP_COUNT = 6
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_parallel_generation_matches_the_serial_model():
+    serial = generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False)
+    parallel = generateNarrativeModelInParallel(buildSetting(LAMP_COUNT), 3, printProcess=False)
+
+    assert len(parallel.narrativeGraph.nodes) == 2 ** LAMP_COUNT
+    assert modelKeys(parallel) == modelKeys(serial)
+
+
+def test_parallel_generation_matches_the_serial_model_up_to_max_depth():
+    serial = generateNarrativeModel(buildSetting(LAMP_COUNT), 2, printProcess=False)
+    parallel = generateNarrativeModelInParallel(buildSetting(LAMP_COUNT), 3, 2, printProcess=False)
+
+    assert modelKeys(parallel) == modelKeys(serial)
+
+
+def test_parallel_generation_with_one_process_is_serial():
+    model = generateNarrativeModelInParallel(buildSetting(LAMP_COUNT), 1, printProcess=False)
+
+    assert modelKeys(model) == modelKeys(generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False))
@@ -0,0 +1,68 @@
+from ravi.Ravi import *
+
+LAMP_COUNT = 10
+
+
+# ======================================================= Context ======================================================
+
+
+def lampName(index: int) -> string:
+    return "lamp " + str(index)
+
+
+def allLampsOn(w: NarrativeState) -> bool:
+    return all(w.getValue(lampName(i), "is on") for i in range(LAMP_COUNT))
+
+
+def switchOn(lamp: string):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(lamp, "is on", True)
+        return w
+
+    return action
+
+
+def clear(w: NarrativeState) -> NarrativeState:
+    w.setValue("switch", "is armed", False)
+    return w
+
+
+def win(w: NarrativeState) -> NarrativeState:
+    w.setValue("switch", "has won", True)
+    return w
+
+
+def buildSetting() -> NarrationSetting:
+    # win only reads the switch once every lamp is on, a state the access set sampling never reaches
+    class_lamp = EntityClass()
+    class_lamp.addProperty("is on", bool, False)
+    class_switch = EntityClass()
+    class_switch.addProperty("is armed", bool, True)
+    class_switch.addProperty("has won", bool, False)
+
+    context = NarrativeContext()
+    for i in range(LAMP_COUNT):
+        context.addEntity(lampName(i), class_lamp)
+    context.addEntity("switch", class_switch)
+
+    choices = [NarrativeChoice(lambda w, lamp=lampName(i): not w.getValue(lamp, "is on"), switchOn(lampName(i)),
+                               "switch on " + lampName(i))
+               for i in range(LAMP_COUNT)]
+    choices.append(NarrativeChoice(lambda w: w.getValue("switch", "is armed"), clear, "clear"))
+    choices.append(NarrativeChoice(lambda w: allLampsOn(w) and w.getValue("switch", "is armed"), win, "win"))
+
+    return NarrationSetting(initial_states={NarrativeState(context)},
+                            choices=choices,
+                            termination_conditions={lambda w: w.getValue("switch", "has won")})
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_reduction_keeps_termination_states_behind_unsampled_guard_reads():
+    full = generateNarrativeModel(buildSetting(), printProcess=False)
+    reduced = generateNarrativeModel(buildSetting(), printProcess=False, reduction=True)
+
+    assert len(full.terminationStates) == 1
+    assert set(state.rows for state in reduced.terminationStates) == \
+           set(state.rows for state in full.terminationStates)
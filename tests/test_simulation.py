@@ -0,0 +1,72 @@
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, lampName
+
+LAMP_COUNT = 4
+PLAYTHROUGHS = 200
+FIRST_LAMP_ON: string = "switch on " + lampName(0)
+
+
+# ======================================================= Context ======================================================
+
+
+def firstLampIsOn(w: NarrativeState) -> bool:
+    return w.getValue(lampName(0), "is on")
+
+
+def buildOneWaySetting() -> NarrationSetting:
+    # lamps can only be switched on and the story ends with the first one
+    setting = buildSetting(LAMP_COUNT)
+    setting.choices = [ch for ch in setting.choices if str(ch).startswith("switch on")]
+    setting.terminationConditions = {firstLampIsOn}
+    return setting
+
+
+def firstLampWeightless(setting: NarrationSetting, form: string):
+    if form == "function":
+        return lambda state, ch: 0.0 if str(ch) == FIRST_LAMP_ON else 1.0
+    return dict((ch, 0.0) for ch in setting.choices if str(ch) == FIRST_LAMP_ON)
+
+
+def summaryOf(report: SimulationReport) -> tuple:
+    return (dict((state.rows, count) for state, count in report.endingCounts.items()),
+            dict((str(ch), count) for ch, count in report.choiceCounts.items()),
+            report.lengthCounts)
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_simulation_with_a_fixed_seed_is_reproducible():
+    first = simulateNarrative(buildOneWaySetting(), PLAYTHROUGHS, seed=7, processes=1, printProcess=False)
+    second = simulateNarrative(buildOneWaySetting(), PLAYTHROUGHS, seed=7, processes=1, printProcess=False)
+
+    assert first.playthroughs == PLAYTHROUGHS
+    assert summaryOf(first) == summaryOf(second)
+
+
+def test_simulation_does_not_depend_on_the_number_of_processes():
+    serial = simulateNarrative(buildOneWaySetting(), PLAYTHROUGHS, seed=7, processes=1, batch_size=50,
+                               printProcess=False)
+    parallel = simulateNarrative(buildOneWaySetting(), PLAYTHROUGHS, seed=7, processes=3, batch_size=50,
+                                 printProcess=False)
+
+    assert summaryOf(parallel) == summaryOf(serial)
+
+
+@pytest.mark.parametrize("form", ["dictionary", "function"])
+def test_weighted_policy_never_picks_a_choice_without_weight_while_others_are_enabled(form):
+    setting = buildOneWaySetting()
+    policy = WeightedPolicy(firstLampWeightless(setting, form))
+    report = simulateNarrative(setting, PLAYTHROUGHS, policy, seed=7, printProcess=False)
+
+    # the first lamp, which ends the story, is only switched on once it is the last one left
+    assert report.lengthCounts == {LAMP_COUNT: PLAYTHROUGHS}
+
+
+def test_uniform_policy_ends_the_story_at_every_length():
+    report = simulateNarrative(buildOneWaySetting(), PLAYTHROUGHS, seed=7, printProcess=False)
+
+    assert set(report.lengthCounts) == set(range(1, LAMP_COUNT + 1))
+    assert report.deadEndRate == 0.0
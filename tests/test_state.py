@@ -0,0 +1,119 @@
+import pytest
+
+from ravi.Ravi import *
+
+ITEMS = ("key", "lamp", "map")
+
+
+# ======================================================= Context ======================================================
+
+
+def buildContext(packed: bool = False) -> NarrativeContext:
+    class_player = EntityClass()
+    class_player.addProperty("inventory", list, [])
+    class_player.addProperty("visited", set, set())
+    class_player.addProperty("notes", dict, dict())
+
+    context = NarrativeContext(packed)
+    context.addEntity("player", class_player)
+    return context
+
+
+def take(item: string):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue("player", "inventory", w.getValue("player", "inventory") + [item])
+        w.setValue("player", "visited", w.getValue("player", "visited") | {item})
+        return w
+
+    return action
+
+
+def buildSetting(packed: bool = False) -> NarrationSetting:
+    choices = [NarrativeChoice(lambda w, item=item: item not in w.getValue("player", "inventory"), take(item),
+                               "take " + item)
+               for item in ITEMS]
+    return NarrationSetting(initial_states={NarrativeState(buildContext(packed))},
+                            choices=choices,
+                            termination_conditions={lambda w: len(w.getValue("player", "inventory")) == len(ITEMS)})
+
+
+# ======================================================== Tests =======================================================
+
+
+@pytest.mark.parametrize("packed", [False, True], ids=["unpacked", "packed"])
+def test_states_with_collection_properties_are_hashed_by_content(packed):
+    first = NarrativeState(buildContext(packed))
+    first.setValue("player", "visited", {"key", "lamp", "map"})
+    first.setValue("player", "notes", {"key": "rusty", "map": "torn"})
+    second = NarrativeState(buildContext(packed))
+    second.setValue("player", "notes", {"map": "torn", "key": "rusty"})
+    second.setValue("player", "visited", {"map", "lamp", "key"})
+
+    assert first == second
+    assert hash(first) == hash(second)
+    assert len({first, second}) == 1
+
+
+@pytest.mark.parametrize("packed", [False, True], ids=["unpacked", "packed"])
+def test_generation_explores_states_with_collection_properties(packed):
+    model = generateNarrativeModel(buildSetting(packed), printProcess=False)
+
+    # every order the items can be taken in: 1 + 3 + 6 + 6
+    assert len(model.narrativeGraph.nodes) == 16
+    assert len(model.terminationStates) == 6
+
+
+def test_properties_of_unhashable_types_are_rejected():
+    class Unhashable(object):
+        __hash__ = None
+
+        def __init__(self, other=None):
+            pass
+
+    class_thing = EntityClass()
+    class_thing.addProperty("value", Unhashable, Unhashable())
+    context = NarrativeContext()
+    context.addEntity("thing", class_thing)
+
+    with pytest.raises(TypeError, match="hashable"):
+        NarrativeState(context)
+
+
+def test_changing_a_collection_in_place_leaves_the_parent_state_alone():
+    def drop(w: NarrativeState) -> NarrativeState:
+        w.getValue("player", "inventory").append("stone")
+        return w
+
+    parent = NarrativeState(buildContext())
+    parent_hash = hash(parent)
+    child = NarrativeChoice(lambda w: True, drop, "drop stone").Action(parent)
+
+    assert parent.getValue("player", "inventory") == []
+    assert hash(parent) == parent_hash
+    assert child.getValue("player", "inventory") == ["stone"]
+    assert hash(child) != parent_hash
+
+
+def test_collections_read_from_read_only_states_are_copies():
+    state = NarrativeState(buildContext()).frozen()
+    state.getValue("player", "inventory").append("stone")
+
+    assert state.getValue("player", "inventory") == []
+
+
+def test_generation_follows_collections_changed_in_place():
+    def takeInPlace(item: string):
+        def action(w: NarrativeState) -> NarrativeState:
+            w.getValue("player", "inventory").append(item)
+            return w
+
+        return action
+
+    setting = buildSetting()
+    setting.choices = [NarrativeChoice(lambda w, item=item: item not in w.getValue("player", "inventory"),
+                                       takeInPlace(item), "take " + item)
+                       for item in ITEMS]
+    model = generateNarrativeModel(setting, printProcess=False)
+
+    assert len(model.narrativeGraph.nodes) == 16
+    assert len(model.terminationStates) == 6
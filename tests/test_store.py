@@ -0,0 +1,61 @@
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, eventKeys, lampName, switchTo
+
+LAMP_COUNT = 6
+
+
+# ======================================================= Context ======================================================
+
+
+@pytest.fixture
+def store():
+    # an LRU far smaller than the 64 states, so nearly every lookup goes to the database
+    store = DiskStateStore(cache_size=4)
+    yield store
+    store.close()
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_stored_generation_matches_the_model(store):
+    model = generateNarrativeModel(buildSetting(LAMP_COUNT), printProcess=False)
+    generateNarrativeStore(buildSetting(LAMP_COUNT), store, printProcess=False)
+
+    assert len(store) == 2 ** LAMP_COUNT
+    assert set(state.rows for state in statesOf(store)) == set(state.rows for state in statesOf(model))
+    assert eventKeys(eventsIn(store)) == eventKeys(eventsIn(model))
+
+
+def test_stored_generation_matches_the_model_up_to_max_depth(store):
+    model = generateNarrativeModel(buildSetting(LAMP_COUNT), 3, printProcess=False)
+    generateNarrativeStore(buildSetting(LAMP_COUNT), store, 3, printProcess=False, incremental=True)
+
+    assert set(state.rows for state in statesOf(store)) == set(state.rows for state in statesOf(model))
+    assert eventKeys(eventsIn(store)) == eventKeys(eventsIn(model))
+
+
+def test_query_functions_accept_a_stored_generation(store):
+    setting = buildSetting(LAMP_COUNT)
+    generateNarrativeStore(setting, store, printProcess=False)
+    events = eventsIn(store)
+    event = next(iter(events))
+    all_on = filterStates(lambda w: all(w.getValue(lampName(i), "is on") for i in range(LAMP_COUNT)), statesOf(store))
+
+    assert len(all_on) == 1
+    assert contains(next(iter(all_on)), store)
+    assert contains(next(iter(all_on)), events)
+    assert contains(event, events)
+    assert contains(event.Choice, events)
+    assert len(choicesOf(store)) == 2 * LAMP_COUNT
+    assert len(filterEventsByChoice(ChoiceSet({event.Choice}), events)) == 2 ** (LAMP_COUNT - 1)
+
+
+def test_stores_reject_choices_sharing_a_name(store):
+    setting = buildSetting(LAMP_COUNT)
+    setting.choices.append(NarrativeChoice(lambda w: True, switchTo(lampName(0), True), str(setting.choices[0])))
+
+    with pytest.raises(Exception, match="more than one choice"):
+        store.bindChoices(setting.choices)
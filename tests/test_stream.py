@@ -0,0 +1,90 @@
+from itertools import islice
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, eventKeys, lampName
+
+LAMP_COUNT = 4
+
+
+# ======================================================= Context ======================================================
+
+
+def onlyFirstOfTwoLampsOn(w: NarrativeState) -> bool:
+    return w.getValue(lampName(0), "is on") and not w.getValue(lampName(1), "is on")
+
+
+def buildOneWaySetting() -> NarrationSetting:
+    # lamps can only be switched on: some states end the story and the one with every lamp on is a dead end
+    setting = buildSetting(LAMP_COUNT)
+    setting.choices = [ch for ch in setting.choices if str(ch).startswith("switch on")]
+    setting.terminationConditions = {onlyFirstOfTwoLampsOn}
+    return setting
+
+
+def streamed(setting: NarrationSetting, max_depth: int = math.inf, store=None) -> Dict[string, list]:
+    items = dict((kind, []) for kind in (STATE_DISCOVERED, EVENT_DISCOVERED, TERMINATION_REACHED, DEAD_END_REACHED))
+    for kind, item in iterateNarrative(setting, max_depth, store=store):
+        items[kind].append(item)
+    return items
+
+
+def rowsOf(states) -> Set[tuple]:
+    return set(state.rows for state in states)
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_stream_discovers_the_states_and_events_of_the_model():
+    model = generateNarrativeModel(buildOneWaySetting(), printProcess=False)
+    items = streamed(buildOneWaySetting())
+
+    assert len(items[STATE_DISCOVERED]) == len(model.narrativeGraph.nodes)
+    assert rowsOf(items[STATE_DISCOVERED]) == rowsOf(model.narrativeGraph.nodes)
+    assert eventKeys(items[EVENT_DISCOVERED]) == eventKeys(model.eventSet)
+
+
+def test_stream_reports_the_termination_states_and_dead_ends_of_the_model():
+    model = generateNarrativeModel(buildOneWaySetting(), printProcess=False)
+    items = streamed(buildOneWaySetting())
+
+    assert len(items[DEAD_END_REACHED]) == 1
+    assert rowsOf(items[TERMINATION_REACHED]) == rowsOf(model.terminationStates)
+    assert rowsOf(items[DEAD_END_REACHED]) == rowsOf(model.deadEnds)
+
+
+def test_stream_reports_states_cut_off_by_max_depth_as_dead_ends():
+    model = generateNarrativeModel(buildOneWaySetting(), 2, printProcess=False)
+    items = streamed(buildOneWaySetting(), 2)
+
+    assert rowsOf(items[STATE_DISCOVERED]) == rowsOf(model.narrativeGraph.nodes)
+    assert rowsOf(items[DEAD_END_REACHED]) == rowsOf(model.deadEnds)
+
+
+def test_stream_into_a_disk_store_matches_the_model():
+    model = generateNarrativeModel(buildOneWaySetting(), printProcess=False)
+    store = DiskStateStore()
+    try:
+        items = streamed(buildOneWaySetting(), store=store)
+        assert eventKeys(items[EVENT_DISCOVERED]) == eventKeys(model.eventSet)
+        assert len(store) == len(model.narrativeGraph.nodes)
+    finally:
+        store.close()
+
+
+def test_stream_explores_only_as_far_as_it_is_consumed():
+    def count(w: NarrativeState) -> NarrativeState:
+        w.setValue("counter", "value", w.getValue("counter", "value") + 1)
+        return w
+
+    class_counter = EntityClass()
+    class_counter.addProperty("value", int, 0)
+    context = NarrativeContext()
+    context.addEntity("counter", class_counter)
+    # an unbounded state space
+    setting = NarrationSetting(initial_states={NarrativeState(context)},
+                               choices=[NarrativeChoice(lambda w: True, count, "count")],
+                               termination_conditions=set())
+
+    states = list(islice((item for kind, item in iterateNarrative(setting) if kind == STATE_DISCOVERED), 10))
+    assert [state.getValue("counter", "value") for state in states] == list(range(10))
@@ -0,0 +1,77 @@
+from ravi.Ravi import *
+
+
+# ======================================================= Context ======================================================
+
+
+def bribe(guard: string):
+    def action(w: NarrativeState) -> NarrativeState:
+        w.setValue(guard, "is bribed", True)
+        return w
+
+    return action
+
+
+def buildSetting(symmetric: bool) -> NarrationSetting:
+    class_guard = EntityClass()
+    class_guard.addProperty("location", int, 0)
+    class_guard.addProperty("is bribed", bool, False)
+
+    context = NarrativeContext()
+    context.addEntity("guard 1", class_guard)
+    context.addEntity("guard 2", class_guard)
+    context.setDefaultValue("guard 1", "location", 3)
+    if symmetric:
+        context.addSymmetry(["guard 1", "guard 2"])
+    context.setDefaultValue("guard 2", "location", 3)
+
+    choices = [NarrativeChoice(lambda w, guard=guard: not w.getValue(guard, "is bribed"), bribe(guard),
+                               "bribe " + guard)
+               for guard in ("guard 1", "guard 2")]
+    return NarrationSetting(initial_states={NarrativeState(context)}, choices=choices, termination_conditions=set())
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_symmetry_accepts_entities_with_different_defaults():
+    full = generateNarrativeModel(buildSetting(False), printProcess=False)
+    reduced = generateNarrativeModel(buildSetting(True), printProcess=False)
+
+    assert len(full.narrativeGraph.nodes) == 4
+    assert len(reduced.narrativeGraph.nodes) == 3
+
+
+def test_symmetry_rejects_entities_with_different_properties():
+    class_guard = EntityClass()
+    class_guard.addProperty("location", int, 0)
+    class_door = EntityClass()
+    class_door.addProperty("location", str, "hall")
+
+    context = NarrativeContext()
+    context.addEntity("guard", class_guard)
+    context.addEntity("door", class_door)
+
+    try:
+        context.addSymmetry(["guard", "door"])
+        assert False
+    except TypeError:
+        pass
+
+
+def onlyGuardOneIsBribed(w: NarrativeState) -> bool:
+    # names one particular guard: the representative of this state has guard 2 bribed instead
+    return w.getValue("guard 1", "is bribed") and not w.getValue("guard 2", "is bribed")
+
+
+def test_symmetric_witness_reaches_a_target_that_names_one_entity():
+    path = findWitness(buildSetting(True), onlyGuardOneIsBribed)
+
+    assert path is not None
+    assert any(onlyGuardOneIsBribed(state) for state in path.States)
+    assert all(event.Choice.Action(event.PreState) == event.PostState for event in path.Events)
+
+
+def test_symmetric_reachability_tests_every_permutation_of_a_state():
+    assert isReachable(buildSetting(True), onlyGuardOneIsBribed)
+    assert isReachable(buildSetting(True), onlyGuardOneIsBribed, propertyDistance({("guard 1", "is bribed"): True}))
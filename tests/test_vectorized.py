@@ -0,0 +1,69 @@
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import lampName, modelKeys
+
+LAMP_COUNT = 6
+# one bit per lamp: too many for the row keys to be packed into one int64
+WIDE_LAMP_COUNT = 70
+
+
+# ======================================================= Context ======================================================
+
+
+def buildSetting(lamp_count: int, termination_conditions: Set[FunctionType] = frozenset()) -> NarrationSetting:
+    class_lamp = EntityClass()
+    class_lamp.addProperty("is on", bool, False)
+
+    context = NarrativeContext()
+    for i in range(lamp_count):
+        context.addEntity(lampName(i), class_lamp)
+
+    choices = []
+    for i in range(lamp_count):
+        choices.append(NarrativeChoice(guardOf(equals(lampName(i), "is on", False)), assign(lampName(i), "is on", True),
+                                       "switch on " + lampName(i)))
+        choices.append(NarrativeChoice(guardOf(equals(lampName(i), "is on", True)), assign(lampName(i), "is on", False),
+                                       "switch off " + lampName(i)))
+    return NarrationSetting(initial_states={NarrativeState(context)},
+                            choices=choices,
+                            termination_conditions=set(termination_conditions))
+
+
+def firstTwoLampsOn(w: NarrativeState) -> bool:
+    return w.getValue(lampName(0), "is on") and w.getValue(lampName(1), "is on")
+
+
+def assertVectorizedMatchesTheModel(setting: NarrationSetting, max_depth: int = math.inf):
+    model = generateNarrativeModel(setting, max_depth, printProcess=False)
+    vectorized = generateNarrativeModelVectorized(setting, max_depth, printProcess=False)
+
+    assert modelKeys(vectorized) == modelKeys(model)
+
+
+# ======================================================== Tests =======================================================
+
+
+def test_vectorized_generation_matches_the_model():
+    assertVectorizedMatchesTheModel(buildSetting(LAMP_COUNT))
+
+
+def test_vectorized_generation_matches_the_model_up_to_max_depth():
+    assertVectorizedMatchesTheModel(buildSetting(LAMP_COUNT), 3)
+
+
+def test_vectorized_generation_stops_at_declarative_and_function_termination_conditions():
+    assertVectorizedMatchesTheModel(buildSetting(LAMP_COUNT, {guardOf(equals(lampName(5), "is on", True)),
+                                                              firstTwoLampsOn}))
+
+
+def test_vectorized_generation_matches_the_model_for_states_wider_than_a_word():
+    assertVectorizedMatchesTheModel(buildSetting(WIDE_LAMP_COUNT), 2)
+
+
+def test_vectorized_generation_rejects_choices_that_are_not_declarative():
+    setting = buildSetting(LAMP_COUNT)
+    setting.choices.append(NarrativeChoice(lambda w: True, assign(lampName(0), "is on", True), "force on"))
+
+    with pytest.raises(TypeError, match="not declarative"):
+        generateNarrativeModelVectorized(setting, printProcess=False)
@@ -0,0 +1,54 @@
+import pytest
+
+from ravi.Ravi import *
+from tests.lamps import buildSetting, lampName
+
+LAMP_COUNT = 4
+# the first three lamps on: three choices away from the initial state
+GOAL = {(lampName(i), "is on"): True for i in range(3)}
+
+
+def reachesGoal(w: NarrativeState) -> bool:
+    return all(w.getValue(entity_name, property_name) == value for (entity_name, property_name), value in GOAL.items())
+
+
+def onlyFirstLampIsOn(w: NarrativeState) -> bool:
+    return w.getValue(lampName(0), "is on") and not any(w.getValue(lampName(i), "is on") for i in range(1, LAMP_COUNT))
+
+
+SEARCHES = pytest.mark.parametrize("heuristic", [None, propertyDistance(GOAL)], ids=["bfs", "a*"])
+
+
+# ======================================================== Tests =======================================================
+
+
+@SEARCHES
+def test_witness_is_a_shortest_path_to_the_target(heuristic):
+    path = findWitness(buildSetting(LAMP_COUNT), reachesGoal, heuristic)
+
+    assert len(path.Events) == 3
+    assert sum(1 for state in path.States if reachesGoal(state)) == 1
+    assert all(event.Choice.Action(event.PreState) == event.PostState for event in path.Events)
+
+
+@SEARCHES
+def test_unreachable_target_has_no_witness(heuristic):
+    setting = buildSetting(LAMP_COUNT)
+    setting.choices = [ch for ch in setting.choices if str(ch) != "switch on " + lampName(0)]
+
+    assert findWitness(setting, reachesGoal, heuristic) is None
+    assert not isReachable(setting, reachesGoal, heuristic)
+
+
+@SEARCHES
+def test_max_depth_cuts_off_the_search(heuristic):
+    assert not isReachable(buildSetting(LAMP_COUNT), reachesGoal, heuristic, max_depth=2)
+    assert isReachable(buildSetting(LAMP_COUNT), reachesGoal, heuristic, max_depth=3)
+
+
+@SEARCHES
+def test_symmetric_witness_ends_in_the_target(heuristic):
+    path = findWitness(buildSetting(LAMP_COUNT, symmetric=True), onlyFirstLampIsOn, heuristic)
+
+    assert len(path.Events) == 1
+    assert onlyFirstLampIsOn(next(iter(path.Events)).PostState)